@@ -0,0 +1,117 @@
+"""Regression benchmark for KubectlCmd.filter_run_list
+
+Run with `poetry run python benchmarks/bench_run_list_filter.py`
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sup.k8s.k8s import (  # noqa: E402
+    WORKLOAD_KIND_LABEL,
+    WORKLOAD_NAME_LABEL,
+    KubectlCmd,
+    RunSummary,
+)
+
+SIZES = (10_000, 50_000)
+WORKLOADS_PER_RUN = 0.1
+BUDGET_IN_SEC = 1.0
+CHAINS = ("AppBuildV1", "AppDeployV1", "ServerlessV1")
+STATUSES = ("Running", "Succeeded", "Failed", "PlatformFailed")
+
+
+def make_runs(count: int):
+    random.seed(count)
+    workloads = max(1, int(count * WORKLOADS_PER_RUN))
+    runs = list()
+    for i in range(count):
+        w = random.randrange(workloads)
+        runs.append(
+            {
+                "metadata": {
+                    "name": f"workload-{w}-run-{i}",
+                    "uid": f"uid-{i}",
+                    "namespace": f"ns-{w % 20}",
+                    "creationTimestamp": f"2024-01-01T{i // 3600 % 24:02}:{i // 60 % 60:02}:{i % 60:02}Z",
+                    "labels": {
+                        "supply-chain.apps.tanzu.vmware.com/workload-name": f"workload-{w}",
+                        "supply-chain.apps.tanzu.vmware.com/workload-kind": CHAINS[
+                            w % len(CHAINS)
+                        ],
+                    },
+                },
+                "status": {
+                    "conditions": [
+                        {"type": "Ready"},
+                        {"reason": random.choice(STATUSES), "message": "Done."},
+                    ],
+                    "workloadRun": {"spec": {"stages": []}},
+                },
+            }
+        )
+    return runs
+
+
+def is_latest(run, run_list):
+    workload = run.get("metadata").get("labels").get(WORKLOAD_NAME_LABEL)
+    created_at_timestamp = run.get("metadata").get("creationTimestamp")
+    for r in run_list:
+        if r.get("metadata").get("labels").get(WORKLOAD_NAME_LABEL) != workload:
+            continue
+        if r.get("metadata").get("creationTimestamp") > created_at_timestamp:
+            return False
+    return True
+
+
+def belongs_to_chains(run, filter_chain):
+    chain = run.get("metadata").get("labels").get(WORKLOAD_KIND_LABEL)
+    return chain.lower() == filter_chain.lower()
+
+
+def belongs_to_statuses(run, filter_status):
+    status = run.get("status").get("conditions")[1].get("reason")
+    return status.lower() == filter_status.lower()
+
+
+def naive_filter(run_list, chain, status):
+    """The quadratic filter that filter_run_list replaced, the reference result"""
+    return [
+        run
+        for run in run_list
+        if is_latest(run, run_list)
+        and (chain == "all" or belongs_to_chains(run, chain))
+        and (status == "all" or belongs_to_statuses(run, status))
+    ]
+
+
+def main():
+    small = make_runs(2_000)
+    summaries = [RunSummary.from_run(run) for run in small]
+    for chain, status in (("all", "all"), (CHAINS[0], "all"), ("all", "Failed")):
+        expected = [
+            run.get("metadata").get("uid") for run in naive_filter(small, chain, status)
+        ]
+        result = KubectlCmd.filter_run_list(summaries, chain=chain, status=status)
+        assert [run.uid for run in result] == expected
+
+    failed = False
+    for size in SIZES:
+        runs = [RunSummary.from_run(run) for run in make_runs(size)]
+        for chain, status in (("all", "all"), (CHAINS[1], "Succeeded")):
+            start = time.perf_counter()
+            result = KubectlCmd.filter_run_list(runs, chain=chain, status=status)
+            elapsed = time.perf_counter() - start
+            print(
+                f"runs={size} chain={chain} status={status} kept={len(result)} time={elapsed * 1000:.1f}ms"
+            )
+            failed = failed or elapsed > BUDGET_IN_SEC
+    if failed:
+        print(f"filter_run_list exceeded the {BUDGET_IN_SEC}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Startup benchmark for the `sup` entry point
+
+Measures the time from process start to the first painted RunList frame and
+fails when the median goes over the budget.
+
+Run with `poetry run python benchmarks/bench_startup.py`
+"""
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RUNS = 5
+BUDGET_IN_SEC = 0.6
+
+# Runs in a fresh interpreter so every import is paid for, the app exits as soon
+# as the frame with the RunList has been painted
+CHILD = """
+import sys
+import time
+
+sys.path.insert(0, sys.argv[1])
+
+from sup.app.app import Sup
+
+
+class StartupSup(Sup):
+    CSS_PATH = sys.argv[1] + "/sup/styles/sup.css"
+
+    def on_mount(self):
+        self.call_after_refresh(self.painted)
+
+    def painted(self):
+        print(time.time(), flush=True)
+        self.exit()
+
+
+StartupSup().run(headless=True)
+"""
+
+
+def startup_time():
+    start = time.time()
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, str(ROOT)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        check=True,
+    ).stdout
+    return float(out.strip().splitlines()[-1]) - start
+
+
+def main():
+    times = [startup_time() for _ in range(RUNS)]
+    median = statistics.median(times)
+    print(
+        f"runs={RUNS} median={median * 1000:.0f}ms min={min(times) * 1000:.0f}ms max={max(times) * 1000:.0f}ms"
+    )
+    if median > BUDGET_IN_SEC:
+        print(f"sup startup exceeded the {BUDGET_IN_SEC}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""Benchmark suite of the hot paths of sup against a generated fake cluster
+
+Every benchmark is timed `--repeat` times and reported as min, median and max
+milliseconds. `--json <file>` writes the results with the scale and the
+environment they were measured with, `--baseline <file>` compares the medians
+with an earlier result file and fails when one got slower than `--tolerance`.
+
+Run with `poetry run python benchmarks/bench_suite.py --runs 20000 --json results.json`
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+from importlib import metadata
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sup.k8s.cluster import Cluster  # noqa: E402
+from sup.k8s.fake import CHAINS, FakeCluster  # noqa: E402
+from sup.k8s.k8s import KubectlCmd, RunSummary  # noqa: E402
+
+RESULT_FORMAT = 1
+FILTER_QUERY = "workload-12"
+FUZZY_QUERY = "~wkld12"
+SEARCH_QUERY = "step 1999:"
+
+
+class Suite:
+    def __init__(self, repeat: int, only: str = None):
+        self.repeat = repeat
+        self.only = only
+        self.results = list()
+
+    def skipped(self, name: str):
+        return bool(self.only) and self.only not in name
+
+    def measure(self, name: str, func, setup=None, **params):
+        """Time `func()` `repeat` times, `setup()` runs untimed before every call"""
+        if self.skipped(name):
+            return
+        times = list()
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - start) * 1000)
+        self.record(name, times, params)
+
+    async def measure_ui(self, name: str, func, pilot, setup=None, **params):
+        """Like `measure`, lets the app process what every call scheduled before the next"""
+        if self.skipped(name):
+            return
+        times = list()
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - start) * 1000)
+            await pilot.pause()
+        self.record(name, times, params)
+
+    def record(self, name: str, times, params):
+        result = {
+            "name": name,
+            "params": params,
+            "repeat": self.repeat,
+            "min_ms": round(min(times), 3),
+            "median_ms": round(statistics.median(times), 3),
+            "max_ms": round(max(times), 3),
+        }
+        self.results.append(result)
+        described = " ".join(f"{key}={value}" for key, value in params.items())
+        print(
+            f"{name:<30} {described:<36} median={result['median_ms']:>9.2f}ms "
+            f"min={result['min_ms']:.2f}ms max={result['max_ms']:.2f}ms",
+            flush=True,
+        )
+
+
+def bench_data(suite: Suite):
+    suite.measure(
+        "get_run_list",
+        lambda: Cluster.get_run_list(latest=True),
+        runs=FakeCluster.scale["runs"],
+    )
+    suite.measure(
+        "get_run_list_chain",
+        lambda: Cluster.get_run_list(chain=CHAINS[0], latest=True),
+        chain=CHAINS[0],
+    )
+    summaries = Cluster.get_run_list(latest=False)
+    for chain, status in (("all", "all"), (CHAINS[1], "Failed")):
+        suite.measure(
+            "filter_run_list",
+            lambda: KubectlCmd.filter_run_list(summaries, chain=chain, status=status),
+            chain=chain,
+            status=status,
+        )
+    run = summaries[len(summaries) // 2]
+    suite.measure(
+        "get_run_detail", lambda: Cluster.get_run_detail(run.run, run.namespace)
+    )
+
+
+async def bench_run_list(suite: Suite, pilot, app):
+    from sup.widgets.run_list import RunList
+
+    run_list = app.query_one(RunList)
+    while not run_list.run_data:
+        await pilot.pause(0.1)
+    runs = Cluster.get_run_list(latest=False)
+
+    def fill():
+        # Rows beyond the first frame are added after refreshes, add them all now
+        while run_list.pending_rows:
+            run_list.add_pending_rows(run_list.render_generation)
+
+    def show(run_data, filled=True):
+        run_list.set_reactive(RunList.run_data, run_data)
+        run_list.watch_run_data()
+        if filled:
+            fill()
+
+    def reset():
+        run_list.set_filter_string("")
+        show([])
+
+    suite.measure(
+        "watch_run_data_first_frame",
+        lambda: show(runs, filled=False),
+        reset,
+        rows=len(runs),
+    )
+    suite.measure("watch_run_data_cold", lambda: show(runs), reset, rows=len(runs))
+    show(runs)
+    suite.measure("watch_run_data_warm", lambda: show(runs), rows=len(runs))
+
+    # One run in a hundred has a new resourceVersion
+    updated = list(runs)
+    for index in range(0, len(updated), 100):
+        run = RunSummary.load(updated[index].dump())
+        run.resource_version = f"{run.resource_version}-1"
+        run.reason = "Succeeded"
+        updated[index] = run
+
+    def update():
+        show(runs)
+        show(updated)
+
+    suite.measure(
+        "watch_run_data_update",
+        update,
+        rows=len(runs),
+        changed=len(runs[::100]),
+    )
+
+    for query in (FILTER_QUERY, FUZZY_QUERY):
+        prefixes = [query[: n + 1] for n in range(len(query))]
+        if query.startswith("~"):
+            prefixes = prefixes[1:]
+
+        def type_query(filled):
+            for prefix in prefixes:
+                run_list.set_filter_string(prefix)
+                if filled:
+                    fill()
+
+        def clear_query():
+            run_list.set_filter_string("")
+            fill()
+
+        # Until every keystroke shows its first frame of rows, and until the
+        # table holds all of them
+        suite.measure(
+            "filter_keystrokes",
+            lambda: type_query(False),
+            clear_query,
+            query=query,
+            keystrokes=len(prefixes),
+        )
+        suite.measure(
+            "filter_keystrokes_filled",
+            lambda: type_query(True),
+            clear_query,
+            query=query,
+            keystrokes=len(prefixes),
+        )
+    clear_query()
+
+
+async def bench_run_detail(suite: Suite, pilot, app):
+    from sup.screens.run_details import RunDetail
+
+    # The run with the most started stages and resumptions has the fullest tree
+    runs = Cluster.get_run_list(latest=False, status="Succeeded")
+    run = runs[0]
+    screen = RunDetail(run=run.run, namespace=run.namespace)
+    await app.push_screen(screen)
+    while not screen.stage_nodes:
+        await pilot.pause(0.1)
+    tree = screen.query_one("#stagesTree")
+
+    def clear_tree():
+        tree.root.remove_children()
+        screen.stage_nodes = dict()
+        screen.selected_stage = dict()
+
+    suite.measure(
+        "populate_stage_tree_cold",
+        screen.populate_stage_tree,
+        clear_tree,
+        stages=FakeCluster.scale["stages"],
+        resumptions=FakeCluster.scale["resumptions"],
+    )
+    await pilot.pause(0.1)
+    suite.measure(
+        "populate_stage_tree_update",
+        screen.populate_stage_tree,
+        nodes=len(screen.stage_nodes),
+    )
+
+    # Every call shows the next stage or resumption, its page is rendered anew
+    nodes = itertools.cycle(screen.stage_nodes.values())
+
+    def show_details():
+        screen.selected_stage = next(nodes)
+        screen.populate_stage_details()
+
+    await suite.measure_ui(
+        "populate_stage_details",
+        show_details,
+        pilot,
+        screen.stage_detail_cache.clear,
+        nodes=len(screen.stage_nodes),
+    )
+    app.pop_screen()
+    await pilot.pause(0.1)
+
+
+async def bench_logs(suite: Suite, pilot, app):
+    from sup.widgets.log_viewer import LogSpool, LogViewer
+
+    _, lines = FakeCluster.log_lines("stage-object-name", "bench")
+    lines = list(lines)
+
+    def fill(spool):
+        for line in lines:
+            spool.append(line)
+
+    spools = list()
+
+    def new_spool():
+        spools.append(LogSpool())
+
+    suite.measure(
+        "log_spool_append", lambda: fill(spools[-1]), new_spool, lines=len(lines)
+    )
+    for spool in spools:
+        spool.close()
+
+    # On a screen of its own the viewer gets the whole terminal height
+    from textual.screen import Screen
+
+    screen = Screen()
+    await app.push_screen(screen)
+    viewer = LogViewer()
+    viewer.styles.height = "100%"
+    await screen.mount(viewer)
+    fill(viewer.spool)
+    viewer.sync()
+    await pilot.pause(0.1)
+    height = max(1, viewer.size.height)
+
+    def render_pages():
+        # The top, the middle and the end of the log, every line on screen
+        for y in (0, len(lines) // 2, len(lines) - height):
+            viewer.scroll_to(y=y, animate=False)
+            for row in range(height):
+                viewer.render_line(row)
+
+    suite.measure("log_render_pages", render_pages, lines=len(lines), height=height)
+    pattern = LogViewer.compile(SEARCH_QUERY)
+    suite.measure(
+        "log_search",
+        lambda: viewer.spool.find(pattern, 0, len(viewer.spool)),
+        lines=len(lines),
+        query=SEARCH_QUERY,
+    )
+    app.pop_screen()
+
+
+async def bench_ui(suite: Suite):
+    from sup.app.app import Sup
+
+    app = Sup()
+    async with app.run_test(headless=True, size=(200, 50)) as pilot:
+        await bench_run_list(suite, pilot, app)
+        await bench_run_detail(suite, pilot, app)
+        await bench_logs(suite, pilot, app)
+
+
+def environment():
+    try:
+        version = metadata.version("sup")
+    except metadata.PackageNotFoundError:
+        version = None
+    return {
+        "sup": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def compare(results, baseline_path: Path, tolerance: float):
+    """Names of the benchmarks whose median got slower than the baseline allows"""
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    key = lambda r: (r["name"], json.dumps(r["params"], sort_keys=True))  # noqa: E731
+    medians = {key(r): r["median_ms"] for r in baseline["results"]}
+    regressions = list()
+    for result in results:
+        before = medians.get(key(result))
+        if not before:
+            continue
+        ratio = result["median_ms"] / before
+        print(
+            f"{result['name']:<30} {before:>9.2f}ms -> {result['median_ms']:.2f}ms x{ratio:.2f}"
+        )
+        if ratio > tolerance:
+            regressions.append(result["name"])
+    return regressions
+
+
+def parser():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--runs", type=int, default=10_000)
+    p.add_argument("--workloads", type=int, default=1_000)
+    p.add_argument("--stages", type=int, default=6)
+    p.add_argument("--resumptions", type=int, default=3)
+    p.add_argument("--log-lines", type=int, default=100_000)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--only", help="Only run the benchmarks whose name contains this")
+    p.add_argument("--json", type=Path, help="Write the results to this file")
+    p.add_argument("--baseline", type=Path, help="Results file to compare with")
+    p.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.25,
+        help="Slowest allowed median relative to the baseline",
+    )
+    return p
+
+
+def main():
+    args = parser().parse_args()
+    Cluster.use("fake")
+    FakeCluster.configure(
+        runs=args.runs,
+        workloads=args.workloads,
+        stages=args.stages,
+        resumptions=args.resumptions,
+        log_lines=args.log_lines,
+    )
+    start = time.perf_counter()
+    FakeCluster.list_runs()
+    print(f"Generated {args.runs} runs in {time.perf_counter() - start:.1f}s")
+
+    suite = Suite(args.repeat, args.only)
+    bench_data(suite)
+    asyncio.run(bench_ui(suite))
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "format": RESULT_FORMAT,
+                    "environment": environment(),
+                    "scale": FakeCluster.scale,
+                    "results": suite.results,
+                },
+                f,
+                indent=2,
+            )
+    if args.baseline is not None:
+        regressions = compare(suite.results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"Slower than the baseline allows: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 from textual.app import App, ComposeResult
+from textual.binding import Binding
 from textual.widgets import Footer
 
+from ..widgets.perf_panel import PerfPanel
 from ..widgets.run_list import RunList
 
 
@@ -12,12 +14,32 @@ class Sup(App):
 
     CSS_PATH = "../styles/sup.css"
 
+    BINDINGS = [Binding("f12", "toggle_perf_panel", "Perf Panel")]
+
+    def __init__(self, contexts=None, namespaces=None, namespaced=False):
+        super().__init__()
+        self.contexts = contexts
+        self.namespaces = namespaces
+        self.namespaced = namespaced
+
     def compose(self) -> ComposeResult:
         """Create child widgets for the app."""
         yield Footer()
-        yield RunList()
-
-
-def run() -> None:
-    """Run the application."""
-    Sup().run()
+        yield RunList(
+            contexts=self.contexts,
+            namespaces=self.namespaces,
+            namespaced=self.namespaced,
+        )
+
+    def action_toggle_perf_panel(self):
+        """Show or hide the timing spans on the current screen"""
+        panels = self.screen.query(PerfPanel)
+        if panels:
+            panels.remove()
+        else:
+            self.screen.mount(PerfPanel())
+
+
+def run(contexts=None, namespaces=None, namespaced=False) -> None:
+    """Run the application, across several kubeconfig contexts when given."""
+    Sup(contexts=contexts, namespaces=namespaces, namespaced=namespaced).run()
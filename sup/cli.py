@@ -0,0 +1,226 @@
+import argparse
+import json
+import sys
+from functools import partial
+
+from sup.k8s.cluster import Cluster
+from sup.k8s.fake import FakeCluster
+from sup.k8s.k8s import KubectlCmd, CLUSTER_COLUMN, RUN_COLUMNS
+from sup.trace import Tracer
+
+# Headless subcommands only need the kubectl data layer, textual and rich are
+# imported by the TUI alone so a script calling `sup runs` starts quickly
+
+
+CLUSTER_TIMEOUT_IN_SEC = 30
+
+
+def format_table(columns, rows):
+    header = tuple(column.upper() for column in columns)
+    widths = [max(len(v) for v in col) for col in zip(header, *rows)]
+    return "\n".join(
+        "   ".join(v.ljust(w) for v, w in zip(row, widths)).rstrip()
+        for row in (header, *rows)
+    )
+
+
+def selected_contexts(args):
+    """Kubeconfig contexts named on the command line, None for the current one"""
+    if args.all_contexts:
+        return Cluster.contexts()
+    return args.context
+
+
+def namespaced_run_list(fetch, namespaces, context=None):
+    return fetch(context=context, namespaces=namespaces or Cluster.namespaces(context))
+
+
+def chain_run_list(fetch, chain, context=None, **kwargs):
+    return fetch(chain=Cluster.chain_kind(chain, context), context=context, **kwargs)
+
+
+def runs(args):
+    fetch = partial(Cluster.get_run_list, status=args.status, latest=args.latest)
+    if args.chain:
+        fetch = partial(chain_run_list, fetch, args.chain)
+    if args.namespace or args.namespaced:
+        fetch = partial(namespaced_run_list, fetch, args.namespace)
+    contexts = selected_contexts(args)
+    code = 0
+    if not contexts or len(contexts) == 1:
+        columns = RUN_COLUMNS
+        context = contexts[0] if contexts else None
+        rows = [run.values() for run in fetch(context=context)]
+    else:
+        # Clusters are queried concurrently, one that fails does not hide the others
+        results, errors = KubectlCmd.per_context(
+            lambda context: fetch(context=context), contexts, CLUSTER_TIMEOUT_IN_SEC
+        )
+        for context, err in errors.items():
+            print(f"sup: {context}: {err}", file=sys.stderr)
+            code = 1
+        columns = (CLUSTER_COLUMN,) + RUN_COLUMNS
+        rows = [
+            (context,) + run.values()
+            for context in contexts
+            for run in results.get(context, [])
+        ]
+    if args.output == "json":
+        print(
+            json.dumps(
+                [dict(zip(columns, row)) for row in rows],
+                indent=2,
+                ensure_ascii=False,
+            )
+        )
+    else:
+        print(format_table(columns, rows))
+    return code
+
+
+def logs(args):
+    contexts = selected_contexts(args) or [None]
+    namespaces = args.namespace or ["default"]
+    if len(contexts) > 1 or len(namespaces) > 1:
+        raise ValueError("logs are read from one context and namespace")
+    context, namespace = contexts[0], namespaces[0]
+    run_detail = Cluster.get_run_detail(args.run, namespace, context)
+    label, obj = KubectlCmd.log_object(run_detail, args.stage, args.resumption)
+    stream, lines = Cluster.log_lines(label, obj, args.follow, context)
+    try:
+        for line in lines:
+            sys.stdout.write(line.rstrip("\n") + "\n")
+            if args.follow:
+                sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if stream is not None:
+            stream.terminate()
+    return 0
+
+
+# The options are accepted before and after the subcommand. The subcommand's
+# copies default to SUPPRESS, otherwise their defaults would overwrite what was
+# given before the subcommand.
+def add_context_arguments(p, suppress=False):
+    p.add_argument(
+        "--context",
+        action="append",
+        default=argparse.SUPPRESS if suppress else None,
+        help="Kubeconfig context, repeat it to merge runs of several clusters",
+    )
+    p.add_argument(
+        "--all-contexts",
+        action="store_true",
+        default=argparse.SUPPRESS if suppress else False,
+        help="Every context of the kubeconfig",
+    )
+
+
+def add_namespace_arguments(p, suppress=False):
+    p.add_argument(
+        "-n",
+        "--namespace",
+        action="append",
+        default=argparse.SUPPRESS if suppress else None,
+        help="List runs only in this namespace, can be repeated",
+    )
+    p.add_argument(
+        "--namespaced",
+        action="store_true",
+        default=argparse.SUPPRESS if suppress else False,
+        help="List runs namespace by namespace, without cluster-wide access",
+    )
+
+
+def parser():
+    p = argparse.ArgumentParser(
+        prog="sup",
+        description="Interactive CLI for Supplychains, runs the TUI without a subcommand",
+    )
+    p.add_argument(
+        "--transport",
+        choices=tuple(Cluster.BACKENDS),
+        help="Talk to the API server in-process (default of the TUI, falls back to "
+        "kubectl), through kubectl (default of the subcommands), or to a generated "
+        "fake cluster",
+    )
+    p.add_argument(
+        "--fake-scale",
+        default="",
+        help="Size of the generated cluster of the fake transport, e.g. runs=20000,stages=8",
+    )
+    p.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write the timing spans of the session to FILE as a Chrome trace, "
+        "open it in chrome://tracing or ui.perfetto.dev",
+    )
+    add_context_arguments(p)
+    add_namespace_arguments(p)
+    subcommands = p.add_subparsers(dest="command")
+
+    runs_cmd = subcommands.add_parser("runs", help="List runs")
+    runs_cmd.add_argument(
+        "--chain", help="Supply chain workload kind in any case, e.g. appbuildv1"
+    )
+    runs_cmd.add_argument("--status", help="Running, Succeeded, Failed, PlatformFailed")
+    runs_cmd.add_argument(
+        "--latest", action="store_true", help="Only the latest run of every workload"
+    )
+    runs_cmd.add_argument("-o", "--output", choices=("table", "json"), default="table")
+    add_context_arguments(runs_cmd, suppress=True)
+    add_namespace_arguments(runs_cmd, suppress=True)
+    runs_cmd.set_defaults(func=runs)
+
+    logs_cmd = subcommands.add_parser("logs", help="Print the logs of a stage")
+    logs_cmd.add_argument("run", help="Run as <kind>/<name>, e.g. appbuildv1run/x")
+    logs_cmd.add_argument("--stage", required=True)
+    logs_cmd.add_argument("--resumption", help="Resumption of the stage")
+    logs_cmd.add_argument("-f", "--follow", action="store_true")
+    logs_cmd.add_argument(
+        "-n",
+        "--namespace",
+        action="append",
+        default=argparse.SUPPRESS,
+        help="Namespace of the run, default: default",
+    )
+    logs_cmd.add_argument(
+        "--context",
+        action="append",
+        default=argparse.SUPPRESS,
+        help="Kubeconfig context of the run",
+    )
+    logs_cmd.set_defaults(func=logs)
+    return p
+
+
+# noinspection PyBroadException
+def main(argv=None):
+    args = parser().parse_args(argv)
+    # Importing the kubernetes client alone takes longer than a kubectl call, a
+    # headless command is one or two calls and starts faster without it
+    Cluster.use(args.transport or ("api" if args.command is None else "kubectl"))
+    FakeCluster.configure_from(args.fake_scale)
+    if args.trace:
+        Tracer.start_trace()
+    try:
+        if args.command is None:
+            from sup.app.app import run
+
+            run(
+                contexts=selected_contexts(args),
+                namespaces=args.namespace,
+                namespaced=args.namespaced,
+            )
+            return
+        try:
+            code = args.func(args)
+        except Exception as err:
+            print(f"sup: {err}", file=sys.stderr)
+            code = 1
+    finally:
+        if args.trace:
+            Tracer.write_trace(args.trace)
+    sys.exit(code)
@@ -0,0 +1,236 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from sup.k8s.list_stream import ListStream
+
+RUN_CATEGORY = "all-runs"
+SUPPLY_CHAIN_PLURAL = "supplychains"
+
+
+# kubernetes takes about a third of a second to import, so it is imported on first
+# use from the informer threads instead of delaying the first frame.
+# Clients and discovered run kinds are kept per kubeconfig context, None being the
+# current one. A client keeps its connections open in a pool and reuses the
+# credentials the kubeconfig's auth plugin returned until they expire, so unlike a
+# kubectl call only the first call of a context pays for loading it.
+class KubeApi:
+    _api_clients = dict()
+    _run_resources = dict()
+    _run_kinds = dict()
+    _supply_chain_resources = dict()
+    _context_locks = dict()
+    _lock = Lock()
+    request_timeout_in_sec = 30
+    connection_pool_size = 16
+    page_size = 500
+
+    @staticmethod
+    def api_client(context: str = None):
+        from kubernetes import client, config
+
+        with KubeApi._lock:
+            context_lock = KubeApi._context_locks.setdefault(context, Lock())
+        # Loading the kubeconfig runs its auth plugin, contexts authenticate
+        # concurrently and only the threads of one context wait for each other
+        with context_lock:
+            if context not in KubeApi._api_clients:
+                configuration = client.Configuration()
+                # Informer watches, namespace listings and prefetches share the pool
+                configuration.connection_pool_maxsize = KubeApi.connection_pool_size
+                config.load_kube_config(
+                    context=context, client_configuration=configuration
+                )
+                KubeApi._api_clients[context] = client.ApiClient(configuration)
+            return KubeApi._api_clients[context]
+
+    @staticmethod
+    def current_context():
+        from kubernetes import config
+
+        _, current = config.list_kube_config_contexts()
+        return current["name"]
+
+    @staticmethod
+    def contexts():
+        from kubernetes import config
+
+        contexts, _ = config.list_kube_config_contexts()
+        return [context["name"] for context in contexts]
+
+    @staticmethod
+    def namespaces(context: str = None):
+        """Namespaces to list runs in, only the context's own one when they can not be listed"""
+        from kubernetes import config
+        from kubernetes.client.rest import ApiException
+
+        try:
+            return [
+                namespace.metadata.name
+                for namespace in KubeApi.core(context)
+                .list_namespace(_request_timeout=KubeApi.request_timeout_in_sec)
+                .items
+            ]
+        except ApiException as err:
+            if err.status != 403:
+                raise
+        contexts, current = config.list_kube_config_contexts()
+        if context is not None:
+            current = next(c for c in contexts if c["name"] == context)
+        return [current["context"].get("namespace") or "default"]
+
+    @staticmethod
+    def custom_objects(context: str = None):
+        from kubernetes import client
+
+        return client.CustomObjectsApi(KubeApi.api_client(context))
+
+    @staticmethod
+    def core(context: str = None):
+        from kubernetes import client
+
+        return client.CoreV1Api(KubeApi.api_client(context))
+
+    @staticmethod
+    def _resources_in_group(group, context: str = None):
+        from kubernetes.client.rest import ApiException
+
+        version = group.preferred_version.version
+        try:
+            resource_list = KubeApi.custom_objects(context).get_api_resources(
+                group.name, version, _request_timeout=KubeApi.request_timeout_in_sec
+            )
+        except ApiException:
+            # Aggregated APIs that are down should not break discovery
+            return []
+        return [
+            (r.kind, (group.name, version, r.name), r.categories or [])
+            for r in resource_list.resources
+            if "/" not in r.name
+        ]
+
+    @staticmethod
+    def run_resources(context: str = None):
+        """Discover every (group, version, plural) that belongs to the all-runs category"""
+        if context not in KubeApi._run_resources:
+            from kubernetes import client
+
+            groups = (
+                client.ApisApi(KubeApi.api_client(context))
+                .get_api_versions(_request_timeout=KubeApi.request_timeout_in_sec)
+                .groups
+            )
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                found = pool.map(
+                    lambda group: KubeApi._resources_in_group(group, context), groups
+                )
+            found = [resource for resources in found for resource in resources]
+            KubeApi._run_kinds[context] = {
+                kind.lower(): resource
+                for kind, resource, categories in found
+                if RUN_CATEGORY in categories
+            }
+            KubeApi._supply_chain_resources[context] = [
+                resource
+                for _, resource, _ in found
+                if resource[2] == SUPPLY_CHAIN_PLURAL
+            ]
+            KubeApi._run_resources[context] = list(KubeApi._run_kinds[context].values())
+        return KubeApi._run_resources[context]
+
+    @staticmethod
+    def run_resource(kind: str, context: str = None):
+        """(group, version, plural) of a run kind, e.g. the `AppBuildV1Run` of `AppBuildV1Run/name`"""
+        KubeApi.run_resources(context)
+        return KubeApi._run_kinds[context][kind.lower()]
+
+    @staticmethod
+    def list_runs(
+        selector: str = None, namespace: str = None, context: str = None, transform=None
+    ):
+        """Runs of one namespace or of all of them, optionally filtered by a label selector"""
+        api = KubeApi.custom_objects(context)
+        runs = list()
+        for group, version, plural in KubeApi.run_resources(context):
+            _continue = None
+            while True:
+                kwargs = dict(
+                    label_selector=selector,
+                    limit=KubeApi.page_size,
+                    _continue=_continue,
+                    _preload_content=False,
+                    _request_timeout=KubeApi.request_timeout_in_sec,
+                )
+                if namespace:
+                    resp = api.list_namespaced_custom_object(
+                        group, version, namespace, plural, **kwargs
+                    )
+                else:
+                    resp = api.list_cluster_custom_object(
+                        group, version, plural, **kwargs
+                    )
+                stream = ListStream(resp)
+                try:
+                    runs.extend(
+                        run if transform is None else transform(run) for run in stream
+                    )
+                finally:
+                    resp.release_conn()
+                _continue = stream.fields.get("metadata", {}).get("continue")
+                if not _continue:
+                    break
+        return runs
+
+    @staticmethod
+    def get_sc_list(context: str = None):
+        KubeApi.run_resources(context)
+        if not KubeApi._supply_chain_resources[context]:
+            raise LookupError(f"The cluster has no {SUPPLY_CHAIN_PLURAL} resource")
+        group, version, plural = KubeApi._supply_chain_resources[context][0]
+        resp = KubeApi.custom_objects(context).list_cluster_custom_object(
+            group,
+            version,
+            plural,
+            _preload_content=False,
+            _request_timeout=KubeApi.request_timeout_in_sec,
+        )
+        try:
+            return list(ListStream(resp))
+        finally:
+            resp.release_conn()
+
+    @staticmethod
+    def delete_run(run: str, namespace: str, context: str = None):
+        kind, name = run.split("/")
+        group, version, plural = KubeApi.run_resource(kind, context)
+        # Same propagation as kubectl delete
+        KubeApi.custom_objects(context).delete_namespaced_custom_object(
+            group,
+            version,
+            namespace,
+            plural,
+            name,
+            propagation_policy="Background",
+            _request_timeout=KubeApi.request_timeout_in_sec,
+        )
+
+    @staticmethod
+    def log_lines(label: str, obj: str, follow=False, context: str = None):
+        """(stream to terminate, log lines) of the pods of a stage or resumption"""
+        from sup.k8s.logs import PodLogStream
+
+        stream = PodLogStream(label, obj, follow=follow, context=context)
+        return stream, stream.lines()
+
+    @staticmethod
+    def get_run_detail(run: str, namespace: str, context: str = None):
+        """Same object as `kubectl get <kind>/<name> -n <namespace> -ojson`"""
+        kind, name = run.split("/")
+        group, version, plural = KubeApi.run_resource(kind, context)
+        return KubeApi.custom_objects(context).get_namespaced_custom_object(
+            group,
+            version,
+            namespace,
+            plural,
+            name,
+            _request_timeout=KubeApi.request_timeout_in_sec,
+        )
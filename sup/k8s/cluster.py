@@ -0,0 +1,132 @@
+from functools import partial
+
+from sup.k8s.api import KubeApi
+from sup.k8s.fake import FakeCluster
+from sup.k8s.k8s import KubectlCmd, RunSummary
+from sup.trace import Tracer
+
+
+# noinspection PyBroadException
+class Cluster:
+    """Cluster calls of the UI and the CLI, made through one of two backends.
+
+    KubeApi talks to the API server in-process over pooled keep-alive connections
+    and loads a context's kubeconfig and credentials once. KubectlCmd runs a kubectl
+    process per call, which reloads both every time. KubeApi is the default and a
+    call it could not make is retried with kubectl, a call the server answered with
+    an error is not, kubectl would get the same answer. FakeCluster serves generated
+    runs for demos and benchmarks.
+    """
+
+    BACKENDS = {"api": KubeApi, "kubectl": KubectlCmd, "fake": FakeCluster}
+    backend = KubeApi
+    fallback = KubectlCmd
+
+    @staticmethod
+    def use(name: str):
+        Cluster.backend = Cluster.BACKENDS[name]
+
+    @staticmethod
+    def in_process():
+        """Informers and pod log streams use the API client directly, only when selected"""
+        return Cluster.backend is KubeApi
+
+    @staticmethod
+    def _call(method: str, *args, **kwargs):
+        with Tracer.span(f"cluster.{method}", backend=Cluster.backend.__name__) as span:
+            try:
+                return getattr(Cluster.backend, method)(*args, **kwargs)
+            except Exception as err:
+                status = getattr(err, "status", None)
+                answered = isinstance(status, int) and 400 <= status < 500
+                if not Cluster.in_process() or answered:
+                    raise
+            span["fallback"] = Cluster.fallback.__name__
+            return getattr(Cluster.fallback, method)(*args, **kwargs)
+
+    @staticmethod
+    def current_context():
+        return Cluster._call("current_context")
+
+    @staticmethod
+    def contexts():
+        return Cluster._call("contexts")
+
+    @staticmethod
+    def namespaces(context: str = None):
+        return Cluster._call("namespaces", context)
+
+    @staticmethod
+    def list_runs(
+        selector: str = None, namespace: str = None, context: str = None, transform=None
+    ):
+        return Cluster._call("list_runs", selector, namespace, context, transform)
+
+    @staticmethod
+    def chain_kind(chain: str, context: str = None):
+        """Workload kind of a supply chain named by its kind in any case, or its name.
+
+        Runs are selected by the exact, case-sensitive kind label. The chain is used
+        as given when the supply chains can not be listed or define no kinds.
+        """
+        if not chain or chain == "all":
+            return chain
+        try:
+            supply_chains = Cluster.get_sc_list(context)
+        except Exception:
+            return chain
+        kinds = dict()
+        for sc in supply_chains:
+            kind = sc.get("spec", {}).get("defines", {}).get("kind")
+            if kind:
+                kinds[kind.lower()] = kind
+                kinds[sc.get("metadata").get("name").lower()] = kind
+        if not kinds:
+            return chain
+        if chain.lower() not in kinds:
+            known = ", ".join(sorted(set(kinds.values())))
+            raise ValueError(f"No supply chain defines {chain}, known kinds: {known}")
+        return kinds[chain.lower()]
+
+    @staticmethod
+    @Tracer.traced("get_run_list")
+    def get_run_list(
+        chain: str = None,
+        status: str = None,
+        latest=True,
+        context: str = None,
+        namespaces=None,
+        on_namespace=None,
+    ):
+        """Runs of all namespaces, or only of `namespaces` listed one by one.
+
+        The namespaced form needs no cluster-wide list permission, see
+        `KubectlCmd.list_namespaces` for `on_namespace`.
+        """
+        list_runs = partial(
+            Cluster.list_runs,
+            KubectlCmd.chain_selector(chain),
+            context=context,
+            transform=partial(RunSummary.from_run, cluster=context),
+        )
+        if namespaces is None:
+            run_list = list_runs()
+        else:
+            run_list = KubectlCmd.list_namespaces(list_runs, namespaces, on_namespace)
+        return KubectlCmd.filter_run_list(run_list, chain, status, latest)
+
+    @staticmethod
+    def get_run_detail(run: str, namespace: str, context: str = None):
+        return Cluster._call("get_run_detail", run, namespace, context)
+
+    @staticmethod
+    def get_sc_list(context: str = None):
+        return Cluster._call("get_sc_list", context)
+
+    @staticmethod
+    def delete_run(run: str, namespace: str, context: str = None):
+        return Cluster._call("delete_run", run, namespace, context)
+
+    @staticmethod
+    def log_lines(label: str, obj: str, follow=False, context: str = None):
+        return Cluster._call("log_lines", label, obj, follow, context)
@@ -0,0 +1,308 @@
+import io
+import json
+import random
+import time
+import uuid
+from calendar import timegm
+from threading import Lock
+
+from sup.k8s.k8s import (
+    RESUMPTION_LABEL,
+    STAGE_LABEL,
+    WORKLOAD_KIND_LABEL,
+    WORKLOAD_NAME_LABEL,
+)
+from sup.k8s.list_stream import ListStream
+
+GROUP = "supply-chain.apps.tanzu.vmware.com"
+CHAINS = ("AppBuildV1", "AppDeployV1", "ServerlessV1")
+STAGE_NAMES = ("source", "build", "scan", "config", "test", "deploy", "promote")
+REASONS = ("Succeeded", "Failed", "PlatformFailed", "Running")
+REASON_WEIGHTS = (60, 15, 5, 20)
+LOG_LEVELS = ("INFO", "INFO", "INFO", "DEBUG", "WARN", "ERROR")
+EPOCH = timegm((2024, 1, 1, 0, 0, 0))
+
+
+# noinspection PyUnusedLocal
+class FakeCluster:
+    """Cluster backend that serves generated runs, supply chains and logs from memory.
+
+    Payloads have the shape of the real ones at a configurable scale, so the UI and
+    the benchmarks can exercise their hot paths without a cluster. Everything is
+    derived from `seed`, the same scale always produces the same cluster. Lists are
+    serialized and decoded through ListStream like the responses of the other
+    backends. Runs are kept encoded, a cluster of 20k runs takes about 150MB.
+    """
+
+    scale = dict(
+        runs=2_000,
+        workloads=200,
+        namespaces=20,
+        stages=5,
+        resumptions=2,
+        log_lines=2_000,
+        seed=1,
+    )
+    _lock = Lock()
+    _runs = None
+    _payloads = dict()
+
+    @staticmethod
+    def configure(**scale):
+        unknown = scale.keys() - FakeCluster.scale.keys()
+        if unknown:
+            raise ValueError(f"Unknown fake cluster settings: {', '.join(unknown)}")
+        with FakeCluster._lock:
+            FakeCluster.scale = {
+                **FakeCluster.scale,
+                **{key: int(value) for key, value in scale.items()},
+            }
+            FakeCluster._runs = None
+            FakeCluster._payloads = dict()
+
+    @staticmethod
+    def configure_from(spec: str):
+        """Configure from a `runs=20000,stages=8` string"""
+        FakeCluster.configure(
+            **dict(item.split("=", 1) for item in spec.split(",") if item)
+        )
+
+    @staticmethod
+    def timestamp(seconds: float):
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(EPOCH + seconds))
+
+    @staticmethod
+    def make_run(index: int, rng: random.Random):
+        scale = FakeCluster.scale
+        workload = rng.randrange(scale["workloads"])
+        chain = CHAINS[workload % len(CHAINS)]
+        namespace = f"team-{workload % scale['namespaces']}"
+        name = f"workload-{workload}-{rng.getrandbits(24):06x}"
+        reason = rng.choices(REASONS, REASON_WEIGHTS)[0]
+        created = index * 30
+        stages = scale["stages"]
+        # Stages before `current` passed, `current` failed or is running, the rest wait
+        current = stages if reason == "Succeeded" else rng.randrange(stages)
+
+        spec_stages, status_stages = list(), list()
+        for s in range(stages):
+            stage = STAGE_NAMES[s % len(STAGE_NAMES)]
+            if s >= len(STAGE_NAMES):
+                stage += f"-{s // len(STAGE_NAMES)}"
+            stage_obj = f"{name}-{stage}"
+            spec_stage = {
+                "name": stage,
+                "componentRef": {"name": f"{stage}-1.0.0", "namespace": namespace},
+                "resumptions": [
+                    {"name": f"check-{r}"} for r in range(scale["resumptions"])
+                ],
+            }
+            spec_stages.append(spec_stage)
+            if s > current or (s == current and reason == "Succeeded"):
+                continue
+            started = created + s * 120
+            done = s < current or reason != "Running"
+            passed = s < current
+            status_stage = {
+                "name": stage,
+                "ref": {"name": stage_obj, "namespace": namespace},
+                "pipelineRun": {
+                    "ref": {"name": f"{stage_obj}-pr", "namespace": namespace}
+                },
+                "resumptions": list(),
+            }
+            status_stages.append(status_stage)
+            spec_stage["pipeline"] = {"started": FakeCluster.timestamp(started)}
+            if done:
+                spec_stage["pipeline"].update(
+                    passed=passed,
+                    completed=FakeCluster.timestamp(started + 90),
+                    message="" if passed else f"Stage {stage} failed, see the logs",
+                    results=[
+                        {
+                            "name": "digest",
+                            "value": f"sha256:{rng.getrandbits(256):064x}",
+                        }
+                    ],
+                )
+                spec_stage["outputs"] = [
+                    {"name": "image", "digest": f"sha256:{rng.getrandbits(256):064x}"}
+                ]
+            for r, resumption in enumerate(spec_stage["resumptions"]):
+                if not done and r > 0:
+                    break
+                resumption_obj = f"{stage_obj}-{resumption['name']}"
+                resumption["started"] = FakeCluster.timestamp(started + r)
+                if done:
+                    resumption.update(
+                        key=f"{rng.getrandbits(64):016x}",
+                        message="Up to date",
+                        passed=True,
+                        completed=FakeCluster.timestamp(started + r + 10),
+                        results=[{"name": "revision", "value": f"{index}.{r}"}],
+                        resultDigest=f"sha256:{rng.getrandbits(256):064x}",
+                    )
+                status_stage["resumptions"].append(
+                    {
+                        "name": resumption["name"],
+                        "ref": {"name": resumption_obj, "namespace": namespace},
+                        "taskRun": {
+                            "ref": {
+                                "name": f"{resumption_obj}-tr",
+                                "namespace": namespace,
+                            }
+                        },
+                    }
+                )
+
+        return {
+            "apiVersion": f"{GROUP}/v1alpha1",
+            "kind": f"{chain}Run",
+            "metadata": {
+                "name": name,
+                "namespace": namespace,
+                "uid": str(uuid.UUID(int=rng.getrandbits(128))),
+                "resourceVersion": str(1000 + index),
+                "creationTimestamp": FakeCluster.timestamp(created),
+                "labels": {
+                    WORKLOAD_NAME_LABEL: f"workload-{workload}",
+                    WORKLOAD_KIND_LABEL: chain,
+                },
+            },
+            "spec": {"cause": {"message": f"New revision of workload-{workload}"}},
+            "status": {
+                "conditions": [
+                    {"type": "Succeeded", "status": str(reason == "Succeeded")},
+                    {
+                        "type": "Ready",
+                        "reason": reason,
+                        "message": f"Run {reason.lower()}. Stage {current}",
+                    },
+                ],
+                "stages": status_stages,
+                "workloadRun": {"spec": {"stages": spec_stages}},
+            },
+        }
+
+    @staticmethod
+    def runs():
+        """(namespace, name) -> (labels, JSON) of the generated runs, made on first use"""
+        with FakeCluster._lock:
+            if FakeCluster._runs is None:
+                rng = random.Random(FakeCluster.scale["seed"])
+                FakeCluster._runs = dict()
+                for index in range(FakeCluster.scale["runs"]):
+                    run = FakeCluster.make_run(index, rng)
+                    metadata = run["metadata"]
+                    FakeCluster._runs[(metadata["namespace"], metadata["name"])] = (
+                        metadata["labels"],
+                        json.dumps(run).encode(),
+                    )
+            return FakeCluster._runs
+
+    @staticmethod
+    def _payload(selector: str = None, namespace: str = None):
+        key = (selector, namespace)
+        payload = FakeCluster._payloads.get(key)
+        if payload is None:
+            labels = dict(
+                term.split("=", 1) for term in (selector or "").split(",") if term
+            )
+            items = [
+                run
+                for (ns, _), (run_labels, run) in FakeCluster.runs().items()
+                if (namespace is None or ns == namespace)
+                and all(run_labels.get(k) == v for k, v in labels.items())
+            ]
+            payload = (
+                b'{"apiVersion": "v1", "kind": "List", "items": ['
+                + b", ".join(items)
+                + b'], "metadata": {}}'
+            )
+            FakeCluster._payloads[key] = payload
+        return payload
+
+    @staticmethod
+    def current_context():
+        return "fake"
+
+    @staticmethod
+    def contexts():
+        return ["fake"]
+
+    @staticmethod
+    def namespaces(context: str = None):
+        return [f"team-{n}" for n in range(FakeCluster.scale["namespaces"])]
+
+    @staticmethod
+    def list_runs(
+        selector: str = None, namespace: str = None, context: str = None, transform=None
+    ):
+        stream = ListStream(io.BytesIO(FakeCluster._payload(selector, namespace)))
+        return [run if transform is None else transform(run) for run in stream]
+
+    @staticmethod
+    def get_run_detail(run: str, namespace: str, context: str = None):
+        _, name = run.split("/")
+        found = FakeCluster.runs().get((namespace, name))
+        if found is None:
+            raise LookupError(f"{run} not found in namespace {namespace}")
+        return json.loads(found[1])
+
+    @staticmethod
+    def get_sc_list(context: str = None):
+        return [
+            {
+                "apiVersion": f"{GROUP}/v1alpha1",
+                "kind": "SupplyChain",
+                "metadata": {"name": chain.lower(), "namespace": "platform"},
+                "spec": {
+                    "defines": {
+                        "kind": chain,
+                        "plural": f"{chain.lower()}s",
+                        "group": GROUP,
+                    },
+                    "stages": [
+                        {"name": stage, "componentRef": {"name": f"{stage}-1.0.0"}}
+                        for stage in STAGE_NAMES[: FakeCluster.scale["stages"]]
+                    ],
+                },
+            }
+            for chain in CHAINS
+        ]
+
+    @staticmethod
+    def delete_run(run: str, namespace: str, context: str = None):
+        _, name = run.split("/")
+        runs = FakeCluster.runs()
+        with FakeCluster._lock:
+            if runs.pop((namespace, name), None) is None:
+                raise LookupError(f"{run} not found in namespace {namespace}")
+            FakeCluster._payloads = dict()
+
+    @staticmethod
+    def log_lines(label: str, obj: str, follow=False, context: str = None):
+        """(None, log lines) of the pods of a stage or resumption"""
+        if label not in (STAGE_LABEL, RESUMPTION_LABEL):
+            raise ValueError(f"Unknown log label {label}")
+        rng = random.Random(f"{FakeCluster.scale['seed']}/{obj}")
+
+        def lines():
+            for n in range(FakeCluster.scale["log_lines"]):
+                level = rng.choice(LOG_LEVELS)
+                timestamp = FakeCluster.timestamp(n / 10)[:-1] + f".{n % 10}00000Z"
+                if level == "ERROR":
+                    message = f"\x1b[31mstep {n} failed\x1b[0m exit code {rng.randrange(1, 3)}"
+                elif n % 7 == 0:
+                    message = json.dumps(
+                        {
+                            "step": n,
+                            "object": obj,
+                            "digest": f"{rng.getrandbits(64):016x}",
+                        }
+                    )
+                else:
+                    message = f"step {n}: processed {rng.randrange(1_000)} files in {rng.random():.3f}s"
+                yield f"{timestamp} {level} {message}"
+
+        return None, lines()
@@ -0,0 +1,331 @@
+import socket
+from functools import wraps
+from threading import Event, Lock, Thread
+
+from sup.k8s.api import KubeApi
+from sup.k8s.list_stream import ListStream
+
+HTTP_GONE = 410
+
+
+# noinspection PyBroadException
+class RunInformer:
+    """Local store of runs kept up to date with one list and a resourceVersion based watch"""
+
+    def __init__(
+        self,
+        kind: str = None,
+        context: str = None,
+        namespace: str = None,
+        field_selector: str = None,
+        label_selector: str = None,
+        page_size: int = 500,
+        watch_timeout_in_sec: int = 300,
+        retry_in_sec: int = 5,
+        restore=None,
+        transform=None,
+    ):
+        self.kind = kind
+        self.context = context
+        self.namespace = namespace
+        self.field_selector = field_selector
+        self.label_selector = label_selector
+        self.page_size = page_size
+        self.watch_timeout_in_sec = watch_timeout_in_sec
+        self.retry_in_sec = retry_in_sec
+        self.request_timeout_in_sec = KubeApi.request_timeout_in_sec
+        # Called with the informer from the start thread, before discovery
+        self.restore_handler = restore
+        # Applied to every run before it is stored, the raw object is dropped
+        self.transform = transform
+        self.generation = 0
+        self.synced = False
+        self.error = None
+        # Last failure of a list or watch, cleared once the cluster answers again
+        self.last_error = None
+        self._stores = dict()
+        self._versions = dict()
+        self._resume = dict()
+        self._pending = set()
+        self._lock = Lock()
+        self._stopped = Event()
+        # resource -> (Watch, response) of the watches in progress, closed by `stop`
+        self._watches = dict()
+
+    def start(self):
+        t = Thread(target=self._start_handler, daemon=True)
+        t.start()
+
+    def stop(self):
+        """Stop the watches, the open connections are closed right away instead of
+        when their watch timeout ends"""
+        self._stopped.set()
+        with self._lock:
+            watches = list(self._watches.values())
+            self._watches.clear()
+        for w, resp in watches:
+            w.stop()
+            self._close(resp)
+
+    @staticmethod
+    def _close(resp):
+        # Shutting the socket down unblocks the read of the watch thread. Closing
+        # alone leaves it waiting for the next event, and on urllib3 before 2.3,
+        # which has no HTTPResponse.shutdown, waits for that read to return.
+        sock = getattr(getattr(resp, "connection", None), "sock", None)
+        try:
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        resp.close()
+
+    def items(self):
+        with self._lock:
+            return [run for store in self._stores.values() for run in store.values()]
+
+    def restore(self, resources):
+        """Seed the stores with (resource, resourceVersion, uid -> run) before `start`,
+        the watches then resume from the saved resourceVersions and only relist
+        when those have expired"""
+        with self._lock:
+            for resource, resource_version, runs in resources:
+                self._stores[resource] = dict(runs)
+                self._versions[resource] = resource_version
+                self._resume[resource] = resource_version
+            self.generation += 1
+
+    def snapshot(self):
+        """(resource, resourceVersion, uid -> run) of every resource with a consistent store"""
+        with self._lock:
+            return [
+                (resource, self._versions[resource], dict(store))
+                for resource, store in self._stores.items()
+                if resource in self._versions
+            ]
+
+    def _mark_synced(self, resource):
+        with self._lock:
+            self._pending.discard(resource)
+            self.synced = not self._pending
+
+    def _start_handler(self):
+        if self.restore_handler is not None:
+            try:
+                self.restore_handler(self)
+            except Exception:
+                # A missing or broken snapshot only means a cold start
+                pass
+        try:
+            if self.kind:
+                resources = [KubeApi.run_resource(self.kind, self.context)]
+            else:
+                resources = KubeApi.run_resources(self.context)
+        except Exception as err:
+            self.error = err
+            return
+        with self._lock:
+            # Run kinds that are gone from the cluster are dropped from the snapshot
+            for resource in self._stores.keys() - set(resources):
+                self._stores.pop(resource)
+                self._versions.pop(resource, None)
+            self._pending = set(resources)
+            self.generation += 1
+        if not resources:
+            self.synced = True
+        for resource in resources:
+            t = Thread(target=self._informer_loop, args=resource, daemon=True)
+            t.start()
+
+    def _list_call(self, resource):
+        group, version, plural = resource
+        api = KubeApi.custom_objects(self.context)
+        if self.namespace:
+            return api.list_namespaced_custom_object, (
+                group,
+                version,
+                self.namespace,
+                plural,
+            )
+        return api.list_cluster_custom_object, resource
+
+    def _relist(self, group, version, plural):
+        resource = (group, version, plural)
+        store = dict()
+        with self._lock:
+            # Fill the store page by page on the first list so rows show up early,
+            # a relist swaps the store in once it is complete
+            if resource not in self._stores:
+                self._stores[resource] = store
+        _continue = None
+        list_func, args = self._list_call(resource)
+        while True:
+            resp = list_func(
+                *args,
+                field_selector=self.field_selector,
+                label_selector=self.label_selector,
+                limit=self.page_size,
+                _continue=_continue,
+                _preload_content=False,
+                _request_timeout=self.request_timeout_in_sec,
+            )
+            # Runs are decoded and transformed one at a time straight from the response
+            stream = ListStream(resp)
+            page = dict()
+            try:
+                for run in stream:
+                    transformed = self._transformed(run)
+                    if transformed is not None:
+                        page[run.get("metadata").get("uid")] = transformed
+            finally:
+                resp.release_conn()
+            with self._lock:
+                store.update(page)
+                self.generation += 1
+            metadata = stream.fields.get("metadata")
+            _continue = metadata.get("continue")
+            if not _continue:
+                break
+        resource_version = metadata.get("resourceVersion")
+        self.last_error = None
+        with self._lock:
+            self._stores[resource] = store
+            self._versions[resource] = resource_version
+            self.generation += 1
+        self._mark_synced(resource)
+        return resource_version
+
+    def _apply(self, resource, event_type, run):
+        metadata = run.get("metadata")
+        if event_type not in ("BOOKMARK", "DELETED"):
+            run = self._transformed(run)
+        with self._lock:
+            self._versions[resource] = metadata.get("resourceVersion")
+            if event_type == "BOOKMARK" or run is None:
+                return
+            store = self._stores.setdefault(resource, dict())
+            if event_type == "DELETED":
+                store.pop(metadata.get("uid"), None)
+            else:
+                store[metadata.get("uid")] = run
+            self.generation += 1
+
+    def _transformed(self, run):
+        """The run as stored, None for one the transform can not read"""
+        if self.transform is None:
+            return run
+        try:
+            return self.transform(run)
+        except Exception:
+            # One malformed run is left out instead of failing the list or watch
+            return None
+
+    def _accepted(self, resource, w, watch_func):
+        """`watch_func` that marks `resource` synced once the server accepts the watch
+        and keeps the response of watch `w` for `stop`.
+
+        A resumed watch only delivers the changes since the snapshot, on a quiet
+        cluster there may be none for a long time. A resourceVersion that expired
+        is answered with an error event right away and leads to a relist.
+        """
+
+        @wraps(watch_func)
+        def accepted(*args, **kwargs):
+            resp = watch_func(*args, **kwargs)
+            with self._lock:
+                if not self._stopped.is_set():
+                    self._watches[resource] = (w, resp)
+            if self._stopped.is_set():
+                self._close(resp)
+            self._mark_synced(resource)
+            return resp
+
+        return accepted
+
+    def _informer_loop(self, group, version, plural):
+        from kubernetes import watch
+        from kubernetes.client.rest import ApiException
+
+        resource = (group, version, plural)
+        resource_version = self._resume.pop(resource, None)
+        while not self._stopped.is_set():
+            try:
+                if resource_version is None:
+                    resource_version = self._relist(*resource)
+                list_func, args = self._list_call(resource)
+                w = watch.Watch()
+                for event in w.stream(
+                    self._accepted(resource, w, list_func),
+                    *args,
+                    field_selector=self.field_selector,
+                    label_selector=self.label_selector,
+                    resource_version=resource_version,
+                    timeout_seconds=self.watch_timeout_in_sec,
+                    allow_watch_bookmarks=True,
+                ):
+                    run = event.get("raw_object")
+                    resource_version = run.get("metadata").get("resourceVersion")
+                    self._apply(resource, event.get("type"), run)
+                    self.last_error = None
+                    if self._stopped.is_set():
+                        w.stop()
+            except ApiException as err:
+                # The watch expired, start over from a fresh list
+                resource_version = None
+                if err.status != HTTP_GONE:
+                    self.last_error = err
+                    self._stopped.wait(self.retry_in_sec)
+            except Exception as err:
+                resource_version = None
+                self.last_error = err
+                self._stopped.wait(self.retry_in_sec)
+            finally:
+                with self._lock:
+                    self._watches.pop(resource, None)
+
+
+class ClusterInformers:
+    """RunInformers of several kubeconfig contexts behind the interface of one.
+
+    Every member lists and watches its cluster from its own threads, so a slow or
+    unreachable cluster only delays or fails its own runs.
+    """
+
+    def __init__(self, informers):
+        self.members = {informer.context: informer for informer in informers}
+
+    @property
+    def generation(self):
+        return sum(informer.generation for informer in self.members.values())
+
+    @property
+    def synced(self):
+        return all(
+            informer.synced or informer.error is not None
+            for informer in self.members.values()
+        )
+
+    @property
+    def label_selector(self):
+        return next(
+            (informer.label_selector for informer in self.members.values()), None
+        )
+
+    def errors(self):
+        """context -> error of the members that could not start"""
+        return {
+            context: informer.error
+            for context, informer in self.members.items()
+            if informer.error is not None
+        }
+
+    def start(self):
+        for informer in self.members.values():
+            informer.start()
+
+    def stop(self):
+        for informer in self.members.values():
+            informer.stop()
+
+    def items(self):
+        return [run for informer in self.members.values() for run in informer.items()]
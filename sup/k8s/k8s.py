@@ -1,122 +1,402 @@
 import json
+import shlex
 import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+from sup.k8s.list_stream import ListStream
+from sup.trace import Tracer
+
+WORKLOAD_NAME_LABEL = "supply-chain.apps.tanzu.vmware.com/workload-name"
+WORKLOAD_KIND_LABEL = "supply-chain.apps.tanzu.vmware.com/workload-kind"
+STAGE_LABEL = "stage-object-name"
+RESUMPTION_LABEL = "resumption-name"
+RUN_COLUMNS = (
+    "namespace",
+    "supplychain",
+    "run",
+    "ready",
+    "created",
+    "progress",
+    "message",
+)
+CLUSTER_COLUMN = "cluster"
+# kubectl processes listing namespaces at the same time
+NAMESPACE_WORKERS = 8
+PROGRESS_PENDING, PROGRESS_PASSED, PROGRESS_FAILED = range(3)
+PROGRESS_STATES = {True: PROGRESS_PASSED, False: PROGRESS_FAILED}
+PROGRESS_MARKS = "-✓X"
+
+
+class RunSummary:
+    """What the run list needs of a run, the full object is only fetched on drill-down.
+
+    The progress of every stage and resumption is packed into a bytes object of
+    PROGRESS_* states and strings repeated across runs are interned.
+    """
+
+    __slots__ = (
+        "uid",
+        "resource_version",
+        "namespace",
+        "kind",
+        "workload",
+        "name",
+        "reason",
+        "message",
+        "created",
+        "progress",
+        "cluster",
+    )
+
+    def __init__(
+        self,
+        uid: str,
+        resource_version: str,
+        namespace: str,
+        kind: str,
+        workload: str,
+        name: str,
+        reason: str,
+        message: str,
+        created: str,
+        progress: bytes,
+        cluster: str = None,
+    ):
+        self.uid = uid
+        self.resource_version = resource_version
+        self.namespace = sys.intern(namespace)
+        self.kind = sys.intern(kind)
+        self.workload = sys.intern(workload)
+        self.name = name
+        self.reason = sys.intern(reason)
+        self.message = message
+        self.created = created
+        self.progress = progress
+        # kubeconfig context the run was listed from, None for the current one
+        self.cluster = cluster
+
+    @staticmethod
+    def from_run(run, cluster: str = None):
+        metadata = run.get("metadata")
+        labels = metadata.get("labels") or {}
+        # A run that was just created has no status yet, nor a Ready condition
+        status = run.get("status") or {}
+        conditions = status.get("conditions") or []
+        condition = conditions[1] if len(conditions) > 1 else {}
+        workload_run = status.get("workloadRun") or {}
+        progress = bytearray()
+        for stage in (workload_run.get("spec") or {}).get("stages") or []:
+            for resumption in stage.get("resumptions", []):
+                progress.append(PROGRESS_STATES.get(resumption.get("passed"), 0))
+            progress.append(
+                PROGRESS_STATES.get(stage.get("pipeline", {}).get("passed"), 0)
+            )
+        return RunSummary(
+            metadata.get("uid"),
+            metadata.get("resourceVersion"),
+            str(metadata.get("namespace")),
+            str(labels.get(WORKLOAD_KIND_LABEL)),
+            str(labels.get(WORKLOAD_NAME_LABEL)),
+            str(metadata.get("name")),
+            str(condition.get("reason", "")),
+            str(condition.get("message", "")).split(".")[0],
+            str(metadata.get("creationTimestamp")),
+            bytes(progress),
+            cluster,
+        )
+
+    @property
+    def key(self):
+        """Row key that stays unique when runs of several clusters are merged"""
+        return self.uid if self.cluster is None else f"{self.cluster}/{self.uid}"
+
+    @property
+    def run(self):
+        """`<kind>/<name>` of the run object, as accepted by kubectl get"""
+        return f"{self.kind}run/{self.name}"
+
+    def values(self):
+        """Plain RUN_COLUMNS values, shared by the run list and the headless CLI"""
+        return (
+            self.namespace,
+            self.kind,
+            self.workload + "/" + self.name,
+            self.reason,
+            self.created,
+            "".join(PROGRESS_MARKS[state] for state in self.progress),
+            self.message,
+        )
+
+    def dump(self):
+        return [
+            self.uid,
+            self.resource_version,
+            self.namespace,
+            self.kind,
+            self.workload,
+            self.name,
+            self.reason,
+            self.message,
+            self.created,
+            self.progress.hex(),
+            self.cluster,
+        ]
+
+    @staticmethod
+    def load(values):
+        return RunSummary(*values[:9], bytes.fromhex(values[9]), values[10])
 
 
 class KubectlCmd:
     @staticmethod
     def run(cmd):
-        process = subprocess.Popen(
-            "kubectl " + cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-        out, err = process.communicate()
-        process.wait()
+        with Tracer.span("kubectl", cmd=cmd) as span:
+            process = subprocess.Popen(
+                "kubectl " + cmd,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            out, err = process.communicate()
+            process.wait()
+            span["returncode"] = process.returncode
         return process, out, err
 
+    @staticmethod
+    def list_items(cmd, transform=None):
+        """Items of a `kubectl get -ojson` list, decoded one by one from the pipe"""
+        # stderr goes to a file so a chatty kubectl can not block the stdout pipe
+        with Tracer.span("kubectl", cmd=cmd), tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(
+                "kubectl " + cmd, shell=True, stdout=subprocess.PIPE, stderr=stderr
+            )
+            try:
+                return [
+                    item if transform is None else transform(item)
+                    for item in ListStream(process.stdout)
+                ]
+            except ValueError as err:
+                if process.wait():
+                    stderr.seek(0)
+                    message = stderr.read().decode(errors="replace").strip()
+                    raise RuntimeError(message or f"kubectl {cmd} failed") from err
+                raise
+            finally:
+                process.stdout.close()
+                process.wait()
+
+    @staticmethod
+    def list_namespaces(
+        fetch, namespaces, on_namespace=None, workers=NAMESPACE_WORKERS
+    ):
+        """Items `fetch(namespace)` returns for every namespace, called from a bounded pool.
+
+        `on_namespace(namespace, items)` is called from the pool as each namespace
+        returns, so the first results can be shown before the slowest namespace is
+        done. Namespaces that fail, typically for lack of access, are skipped unless
+        all of them fail.
+        """
+        items, errors = list(), list()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(fetch, ns): ns for ns in namespaces}
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                    continue
+                items.extend(future.result())
+                if on_namespace is not None:
+                    on_namespace(futures[future], future.result())
+        if errors and len(errors) == len(futures):
+            raise errors[0]
+        return items
+
     @staticmethod
     def stern_run(cmd):
-        process = subprocess.Popen(
-            "stern" + cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-        out, err = process.communicate()
-        process.wait()
+        with Tracer.span("stern", cmd=cmd):
+            process = subprocess.Popen(
+                "stern" + cmd,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            out, err = process.communicate()
+            process.wait()
         return process, out, err
 
     @staticmethod
-    def get_run_list(chain: str = None, status: str = None, latest=True):
-        _, out, _ = KubectlCmd.run("get all-runs -A -ojson")
-        run_list = json.loads(out).get("items")
+    def context_flag(context: str = None):
+        return f" --context {shlex.quote(context)}" if context else ""
+
+    @staticmethod
+    def per_context(fetch, contexts, timeout_in_sec: float = None):
+        """Call `fetch(context)` for every context concurrently.
+
+        Returns (context -> result, context -> error). A context that has not
+        answered within the timeout is reported as failed without waiting for it.
+        """
+        pool = ThreadPoolExecutor(max_workers=max(1, len(contexts)))
+        futures = {context: pool.submit(fetch, context) for context in contexts}
+        done, _ = wait(futures.values(), timeout=timeout_in_sec)
+        pool.shutdown(wait=False)
+        results, errors = dict(), dict()
+        for context, future in futures.items():
+            if future not in done:
+                errors[context] = TimeoutError(f"No answer within {timeout_in_sec}s")
+            elif future.exception() is not None:
+                errors[context] = future.exception()
+            else:
+                results[context] = future.result()
+        return results, errors
+
+    @staticmethod
+    def current_context():
+        _, out, _ = KubectlCmd.run("config current-context")
+        return out.decode().strip() or "default"
+
+    @staticmethod
+    def namespaces(context: str = None):
+        """Namespaces to list runs in, only the context's own one when they can not be listed"""
+        flag = KubectlCmd.context_flag(context)
+        process, out, _ = KubectlCmd.run("get namespaces -o name" + flag)
+        if process.returncode == 0:
+            return [name.partition("/")[2] for name in out.decode().split()]
+        _, out, _ = KubectlCmd.run(
+            "config view --minify -o jsonpath='{..namespace}'" + flag
+        )
+        return [out.decode().strip() or "default"]
+
+    @staticmethod
+    def contexts():
+        _, out, _ = KubectlCmd.run("config get-contexts -o name")
+        return out.decode().split()
+
+    @staticmethod
+    def list_runs(
+        selector: str = None, namespace: str = None, context: str = None, transform=None
+    ):
+        """Runs of one namespace or of all of them, optionally filtered by a label selector"""
+        scope = " -A" if namespace is None else f" -n {shlex.quote(namespace)}"
+        cmd = (
+            f"get all-runs{scope} -l {shlex.quote(selector)} -ojson"
+            if selector
+            else f"get all-runs{scope} -ojson"
+        )
+        return KubectlCmd.list_items(cmd + KubectlCmd.context_flag(context), transform)
+
+    @staticmethod
+    def chain_selector(chain: str = None):
+        """Label selector that lets the API server filter runs by supply chain"""
+        if not chain or chain == "all":
+            return None
+        return f"{WORKLOAD_KIND_LABEL}={chain}"
+
+    @staticmethod
+    def latest_run_index(run_list):
+        """(cluster, workload name) -> newest creation timestamp of a list of RunSummary"""
+        newest = dict()
+        for run in run_list:
+            key = (run.cluster, run.workload)
+            if key not in newest or run.created > newest[key]:
+                newest[key] = run.created
+        return newest
+
+    @staticmethod
+    @Tracer.traced("filter_run_list")
+    def filter_run_list(run_list, chain: str = None, status: str = None, latest=True):
+        chain = None if not chain or chain == "all" else chain.lower()
+        status = None if not status or status == "all" else status.lower()
+        newest = KubectlCmd.latest_run_index(run_list) if latest else None
         filtered_run_list = list()
         for run in run_list:
-            latest_check_passed = False
-            chain_check_passed = False
-            status_check_passed = False
-
-            if not latest:
-                latest_check_passed = True
-            elif latest and KubectlCmd.is_latest(run, run_list):
-                latest_check_passed = True
-
-            if not chain or chain == "all":
-                chain_check_passed = True
-            elif KubectlCmd.belongs_to_chains(run, chain):
-                chain_check_passed = True
-
-            if not status or status == "all":
-                status_check_passed = True
-            elif KubectlCmd.belongs_to_statuses(run, status):
-                status_check_passed = True
-
-            if latest_check_passed and chain_check_passed and status_check_passed:
-                filtered_run_list.append(run)
+            if latest and run.created < newest[(run.cluster, run.workload)]:
+                continue
+            if chain and run.kind.lower() != chain:
+                continue
+            if status and run.reason.lower() != status:
+                continue
+            filtered_run_list.append(run)
         return filtered_run_list
 
     @staticmethod
-    def get_run_detail(run: str, namespace: str):
-        _, out, _ = KubectlCmd.run(f"get {run} -n {namespace} -ojson")
-        return json.loads(out)
+    def get_run_detail(run: str, namespace: str, context: str = None):
+        _, out, _ = KubectlCmd.run(
+            f"get {run} -n {namespace} -ojson" + KubectlCmd.context_flag(context)
+        )
+        with Tracer.span("json.decode", items=1):
+            return json.loads(out)
 
     @staticmethod
-    def get_sc_list():
-        _, out, _ = KubectlCmd.run("get supplychains -A -ojson")
-        return json.loads(out).get("items")
+    def get_sc_list(context: str = None):
+        return KubectlCmd.list_items(
+            "get supplychains -A -ojson" + KubectlCmd.context_flag(context)
+        )
 
     @staticmethod
-    def get_stern_logs_for_stage(stage_obj):
-        cmd = (
-            """ "" -c ".*" -A -l supply-chain.apps.tanzu.vmware.com/stage-object-name="""
-            + stage_obj
-            + """ --container-state="all" --since=2000h --timestamps --color="auto" --no-follow --only-log-lines --template '{{.Message}} {{"\\n"}}' | sort"""
+    def stern_stream(cmd):
+        # exec so that terminating the process stops stern and not only the shell
+        return subprocess.Popen(
+            "exec stern" + cmd,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
         )
-        # Add [{{color .PodColor .PodName}}] after message to add stage
-        _, out, _ = KubectlCmd.stern_run(cmd)
-        return out.decode(), cmd
 
     @staticmethod
-    def get_stern_logs_for_resumption(resumption_obj):
+    def stern_logs_cmd(label: str, obj: str, follow=False, context: str = None):
         cmd = (
-            """ "" -c ".*" -A -l supply-chain.apps.tanzu.vmware.com/resumption-name="""
-            + resumption_obj
-            + """ --container-state="all" --since=2000h --timestamps --color="auto" --no-follow --only-log-lines --template '{{.Message}} {{"\\n"}}' | sort"""
+            """ "" -c ".*" -A -l supply-chain.apps.tanzu.vmware.com/"""
+            + label
+            + "="
+            + obj
+            + """ --container-state="all" --since=2000h --timestamps --color="auto" --only-log-lines --template '{{.Message}} {{"\\n"}}'"""
+            + KubectlCmd.context_flag(context)
         )
         # Add [{{color .PodColor .PodName}}] after message to add stage
+        if follow:
+            return cmd
+        return cmd + " --no-follow | sort"
+
+    @staticmethod
+    def log_lines(label: str, obj: str, follow=False, context: str = None):
+        """(stream to terminate or None, log lines) of the pods of a stage or resumption"""
+        cmd = KubectlCmd.stern_logs_cmd(label, obj, follow=follow, context=context)
+        if follow:
+            stream = KubectlCmd.stern_stream(cmd)
+            return stream, stream.stdout
         _, out, _ = KubectlCmd.stern_run(cmd)
-        return out.decode(), cmd
+        return None, out.decode().splitlines()
 
     @staticmethod
-    def is_latest(run, run_list):
-        workload = (
-            run.get("metadata")
-            .get("labels")
-            .get("supply-chain.apps.tanzu.vmware.com/workload-name")
+    def log_object(run_detail, stage: str, resumption: str = None):
+        """(label, object name) that selects the pods of a stage or one of its resumptions"""
+        spec_stages = (
+            run_detail.get("status").get("workloadRun").get("spec").get("stages")
         )
-        created_at_timestamp = run.get("metadata").get("creationTimestamp")
-        for r in run_list:
-            if (
-                r.get("metadata")
-                .get("labels")
-                .get("supply-chain.apps.tanzu.vmware.com/workload-name")
-                != workload
-            ):
+        status_stages = run_detail.get("status").get("stages", [])
+        for ct, run_spec_stage in enumerate(spec_stages):
+            if run_spec_stage.get("name") != stage:
                 continue
-            if r.get("metadata").get("creationTimestamp") > created_at_timestamp:
-                return False
-        return True
+            if ct >= len(status_stages):
+                raise ValueError(f"Stage {stage} has not started")
+            if not resumption:
+                return STAGE_LABEL, status_stages[ct].get("ref").get("name")
+            status_resumptions = status_stages[ct].get("resumptions", [])
+            for rct, r in enumerate(run_spec_stage.get("resumptions") or []):
+                if r.get("name") != resumption:
+                    continue
+                if rct >= len(status_resumptions):
+                    raise ValueError(f"Resumption {resumption} has not started")
+                return RESUMPTION_LABEL, status_resumptions[rct].get("ref").get("name")
+            raise ValueError(f"Stage {stage} has no resumption {resumption}")
+        raise ValueError(f"Run has no stage {stage}")
 
     @staticmethod
-    def belongs_to_chains(run, filter_chain):
-        chain = (
-            run.get("metadata")
-            .get("labels")
-            .get("supply-chain.apps.tanzu.vmware.com/workload-kind")
+    def delete_run(run, namespace, context: str = None):
+        process, _, err = KubectlCmd.run(
+            f"delete {run} -n {namespace}" + KubectlCmd.context_flag(context)
         )
-        return chain.lower() == filter_chain.lower()
-
-    @staticmethod
-    def belongs_to_statuses(run, filter_status):
-        status = run.get("status").get("conditions")[1].get("reason")
-        return status.lower() == filter_status.lower()
-
-    @staticmethod
-    def delete_run(run, namespace):
-        process, _, _ = KubectlCmd.run(f"delete {run} -n {namespace}")
-        return process.returncode
+        if process.returncode:
+            raise RuntimeError(err.decode(errors="replace").strip())
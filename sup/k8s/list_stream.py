@@ -0,0 +1,105 @@
+import codecs
+import json
+import re
+import time
+
+from sup.trace import Tracer
+
+WHITESPACE = re.compile(r"\s*")
+# Characters that can follow a complete value
+DELIMITERS = frozenset(",:]} \t\r\n")
+
+
+class ListStream:
+    """Decodes a Kubernetes list response item by item from a binary stream.
+
+    Iterating yields the elements of `items` as soon as each one is complete, so
+    only one item and a read buffer are held at a time. The other top-level fields
+    (`metadata` with the resourceVersion and continue token, `kind`, ...) are in
+    `fields` once the iteration is done. The time spent decoding, without the
+    time waiting for the stream, is recorded as one `json.decode` span ending
+    with the list.
+    """
+
+    def __init__(self, stream, chunk_size: int = 64 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.fields = dict()
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decode_ns = 0
+
+    def _fill(self, size):
+        data = self.stream.read(size)
+        text = self._utf8.decode(data or b"", final=not data)
+        self._buf = self._buf[self._pos :] + text
+        self._pos = 0
+        self._eof = not data
+        return bool(data)
+
+    def _peek(self):
+        while True:
+            self._pos = WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self._pos} of the list")
+        self._pos += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            start = time.perf_counter_ns()
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                self._decode_ns += time.perf_counter_ns() - start
+                # A number cut off by the end of the buffer decodes as a shorter one
+                if self._eof or end < len(self._buf) and self._buf[end] in DELIMITERS:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                self._decode_ns += time.perf_counter_ns() - start
+                if self._eof:
+                    raise
+            # The value runs past the buffer, read at least as much again so a
+            # large item is only decoded a logarithmic number of times
+            self._fill(max(self.chunk_size, len(self._buf) - self._pos))
+
+    def __iter__(self):
+        self._expect("{")
+        items = 0
+        while True:
+            char = self._peek()
+            if char == "}":
+                self._pos += 1
+                end = time.perf_counter_ns()
+                Tracer.record(
+                    "json.decode", end - self._decode_ns, end, {"items": items}
+                )
+                return
+            if char == ",":
+                self._pos += 1
+                continue
+            key = self._value()
+            self._expect(":")
+            if key != "items" or self._peek() != "[":
+                self.fields[key] = self._value()
+                continue
+            self._pos += 1
+            while True:
+                char = self._peek()
+                if char == "]":
+                    self._pos += 1
+                    break
+                if char == ",":
+                    self._pos += 1
+                    continue
+                items += 1
+                yield self._value()
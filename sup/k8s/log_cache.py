@@ -0,0 +1,82 @@
+import json
+import os
+from pathlib import Path
+
+
+class LogCache:
+    """On-disk cache of container logs keyed by pod UID and container name.
+
+    Logs of completed stages and resumptions never change, so once every container
+    of one has been fetched its container list is written to a manifest and later
+    selections are served from disk without touching the cluster. Files are evicted
+    least recently used first once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, directory: Path = None, max_bytes: int = 256 * 1024 * 1024):
+        if directory is None:
+            cache_home = os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")
+            directory = Path(cache_home) / "sup" / "logs"
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def log_path(self, uid: str, container: str):
+        return self.directory / f"{uid}-{container}.log"
+
+    def manifest_path(self, label: str, obj: str):
+        return self.directory / f"{label}-{obj}.json"
+
+    def read_lines(self, uid: str, container: str):
+        """Cached lines of a container, read from disk as they are iterated"""
+        path = self.log_path(uid, container)
+        try:
+            f = open(path, "r", encoding="utf-8", errors="replace")
+        except FileNotFoundError:
+            return
+        path.touch()
+        with f:
+            for line in f:
+                yield line.rstrip("\n")
+
+    def append_lines(self, uid: str, container: str, lines):
+        """Append lines to a container's log as they are iterated, the file is only
+        created for the first one"""
+        f = None
+        try:
+            for line in lines:
+                if f is None:
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    f = open(self.log_path(uid, container), "a", encoding="utf-8")
+                f.write(line + "\n")
+        finally:
+            if f is not None:
+                f.close()
+
+    def read_manifest(self, label: str, obj: str):
+        """Containers of a completed object, or None when its logs are not all on disk"""
+        try:
+            with open(self.manifest_path(label, obj), "r") as f:
+                containers = [tuple(c) for c in json.load(f)]
+        except (FileNotFoundError, ValueError):
+            return None
+        for _, _, uid, container in containers:
+            if not self.log_path(uid, container).exists():
+                return None
+        return containers
+
+    def write_manifest(self, label: str, obj: str, containers):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path(label, obj), "w") as f:
+            json.dump(containers, f)
+
+    def evict(self):
+        if not self.directory.exists():
+            return
+        files = sorted(
+            (p.stat().st_mtime, p.stat().st_size, p) for p in self.directory.iterdir()
+        )
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,199 @@
+import heapq
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Full, Queue
+from threading import Event
+
+from sup.k8s.api import KubeApi
+from sup.k8s.log_cache import LogCache
+
+LABEL_PREFIX = "supply-chain.apps.tanzu.vmware.com/"
+SINCE_SLACK_IN_SEC = 60
+
+
+# noinspection PyBroadException
+class PodLogStream:
+    """Logs of every container of the pods labelled with a stage or resumption object.
+
+    Every container's log is fetched by its own worker through the Kubernetes API into
+    a queue of at most `queue_size` lines, a worker waits while its queue is full. Each
+    container's log is already in timestamp order, so the history is a k-way merge of
+    the per-container streams; in follow mode lines are yielded in the order they arrive.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        obj: str,
+        follow=False,
+        completed=False,
+        cache: LogCache = None,
+        queue_size: int = 1000,
+        context: str = None,
+    ):
+        self.label = label
+        self.obj = obj
+        self.follow = follow
+        self.completed = completed
+        self.cache = cache
+        self.queue_size = queue_size
+        self.context = context
+        self._failed = False
+        self._stopped = Event()
+        self._responses = list()
+        self._pool = None
+
+    @staticmethod
+    def timestamp_key(line: str):
+        # RFC3339Nano drops trailing zeros, pad the fraction so strings sort in time order
+        timestamp = line.split(" ", 1)[0]
+        base, _, fraction = timestamp.rstrip("Z").partition(".")
+        return base + "." + fraction.ljust(9, "0")
+
+    @staticmethod
+    def since_seconds(line: str):
+        """Seconds to ask for so that the fetch starts just before the given line"""
+        timestamp = line.split(" ", 1)[0].rstrip("Z").partition(".")[0]
+        logged_at = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S")
+        elapsed = datetime.now(timezone.utc).replace(tzinfo=None) - logged_at
+        return int(elapsed.total_seconds()) + SINCE_SLACK_IN_SEC
+
+    def _get(self, queue: Queue):
+        # Poll so that a terminated stream does not wait on fetches that were cancelled
+        while not self._stopped.is_set():
+            try:
+                return queue.get(timeout=0.5)
+            except Empty:
+                continue
+        return None
+
+    def _put(self, queue: Queue, line):
+        # Wait for room in the queue unless the stream was terminated meanwhile
+        while not self._stopped.is_set():
+            try:
+                queue.put(line, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _queued_lines(self, queue: Queue):
+        while True:
+            line = self._get(queue)
+            if line is None:
+                return
+            yield line
+
+    def containers(self):
+        pods = KubeApi.core(self.context).list_pod_for_all_namespaces(
+            label_selector=f"{LABEL_PREFIX}{self.label}={self.obj}"
+        )
+        for pod in pods.items:
+            for container in (pod.spec.init_containers or []) + pod.spec.containers:
+                yield (
+                    pod.metadata.namespace,
+                    pod.metadata.name,
+                    pod.metadata.uid,
+                    container.name,
+                )
+
+    def _new_lines(self, resp, last_key, queue: Queue):
+        from kubernetes.watch.watch import iter_resp_lines
+
+        for line in iter_resp_lines(resp):
+            if self._stopped.is_set():
+                break
+            if last_key is not None and self.timestamp_key(line) <= last_key:
+                continue
+            if not self._put(queue, line):
+                break
+            yield line
+
+    def _fetch_handler(self, namespace, pod, uid, container, queue: Queue):
+        try:
+            if self._stopped.is_set():
+                return
+            last = None
+            if self.cache is not None:
+                for last in self.cache.read_lines(uid, container):
+                    if not self._put(queue, last):
+                        return
+            kwargs = dict()
+            last_key = None
+            if last is not None:
+                # Only ask for what was logged after the last cached line
+                last_key = self.timestamp_key(last)
+                kwargs["since_seconds"] = self.since_seconds(last)
+            resp = KubeApi.core(self.context).read_namespaced_pod_log(
+                pod,
+                namespace,
+                container=container,
+                timestamps=True,
+                follow=self.follow,
+                _preload_content=False,
+                **kwargs,
+            )
+            self._responses.append(resp)
+            # New lines are written to the cache as they arrive, none are held here
+            lines = self._new_lines(resp, last_key, queue)
+            if self.cache is not None:
+                self.cache.append_lines(uid, container, lines)
+            else:
+                for _ in lines:
+                    pass
+        except Exception:
+            # Containers that never started have no logs to show
+            self._failed = True
+        finally:
+            self._put(queue, None)
+
+    def lines(self):
+        """List the pods and start fetching, then return an iterator over the log lines"""
+        if self.completed and self.cache is not None:
+            containers = self.cache.read_manifest(self.label, self.obj)
+            if containers is not None:
+                return heapq.merge(
+                    *(self.cache.read_lines(uid, c) for _, _, uid, c in containers),
+                    key=self.timestamp_key,
+                )
+        containers = list(self.containers())
+        # Followed logs never end and the merge needs the next line of every
+        # container, so every container needs its own worker
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(containers)))
+        if self.follow:
+            queue = Queue(maxsize=self.queue_size)
+            for container in containers:
+                self._pool.submit(self._fetch_handler, *container, queue)
+            return self._arrival_order(queue, len(containers))
+        queues = list()
+        for container in containers:
+            queues.append(Queue(maxsize=self.queue_size))
+            self._pool.submit(self._fetch_handler, *container, queues[-1])
+        return self._merged(queues, containers)
+
+    def _merged(self, queues, containers):
+        yield from heapq.merge(
+            *(self._queued_lines(q) for q in queues), key=self.timestamp_key
+        )
+        if self.cache is None:
+            return
+        if self.completed and not self._failed and not self._stopped.is_set():
+            self.cache.write_manifest(self.label, self.obj, containers)
+        self.cache.evict()
+
+    def _arrival_order(self, queue: Queue, streams: int):
+        while streams and not self._stopped.is_set():
+            line = self._get(queue)
+            if line is None:
+                streams -= 1
+            else:
+                yield line
+        if self.cache is not None:
+            self.cache.evict()
+
+    def terminate(self):
+        self._stopped.set()
+        for resp in self._responses:
+            resp.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
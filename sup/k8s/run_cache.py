@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from sup.k8s.cluster import Cluster
+from sup.k8s.k8s import WORKLOAD_KIND_LABEL
+
+
+# noinspection PyBroadException
+class RunDetailCache:
+    """Bounded LRU of run objects keyed by namespace, `<kind>/<name>` and context.
+
+    The run list only keeps summaries, so the full objects of the rows around the
+    cursor are prefetched in the background and a RunDetail screen can render
+    before its own watch has listed anything.
+    """
+
+    def __init__(self, max_size: int = 256, max_age_in_sec: int = 10):
+        self.max_size = max_size
+        self.max_age_in_sec = max_age_in_sec
+        self._runs = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def key(run, context: str = None):
+        metadata = run.get("metadata")
+        kind = str((metadata.get("labels") or {}).get(WORKLOAD_KIND_LABEL)) + "run"
+        return metadata.get("namespace"), f"{kind}/{metadata.get('name')}", context
+
+    def get(self, namespace: str, run: str, context: str = None):
+        key = (namespace, run, context)
+        with self._lock:
+            entry = self._runs.get(key)
+            if entry is None:
+                return None
+            self._runs.move_to_end(key)
+            return entry[1]
+
+    def put(self, run, context: str = None):
+        """Cache a run that was just fetched or delivered by a watch"""
+        key = self.key(run, context)
+        with self._lock:
+            self._runs[key] = (time.monotonic(), run)
+            self._runs.move_to_end(key)
+            while len(self._runs) > self.max_size:
+                self._runs.popitem(last=False)
+
+    def stale(self, namespace: str, run: str, context: str = None):
+        with self._lock:
+            entry = self._runs.get((namespace, run, context))
+        return entry is None or time.monotonic() - entry[0] > self.max_age_in_sec
+
+    @staticmethod
+    def fetch(namespace: str, run: str, context: str = None):
+        return Cluster.get_run_detail(run, namespace, context)
+
+    def prefetch(self, keys):
+        """Fetch the given (namespace, run, context) keys that are stale, returns the runs fetched"""
+        keys = [key for key in keys if self.stale(*key)]
+        if not keys:
+            return []
+        with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+            futures = [pool.submit(self.fetch, *key) for key in keys]
+        runs = list()
+        for (_, _, context), future in zip(keys, futures):
+            try:
+                run = future.result()
+            except Exception:
+                # A run that vanished or could not be fetched is simply not prefetched
+                continue
+            self.put(run, context)
+            runs.append(run)
+        return runs
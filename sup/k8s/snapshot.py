@@ -0,0 +1,79 @@
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+from sup.k8s.k8s import RunSummary
+
+SNAPSHOT_VERSION = 2
+
+
+class RunSnapshot:
+    """Last known run summaries and supply chains of a kubeconfig context, on disk.
+
+    Saved together with the resourceVersion of every run resource so the informer
+    can resume its watches instead of listing everything again.
+    """
+
+    def __init__(self, directory: Path = None):
+        if directory is None:
+            cache_home = os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")
+            directory = Path(cache_home) / "sup" / "snapshots"
+        self.directory = Path(directory)
+
+    def path(self, context: str):
+        return self.directory / (re.sub(r"[^\w.-]", "_", context) + ".json")
+
+    @staticmethod
+    def compact_supply_chain(sc):
+        return {
+            "metadata": {"name": sc.get("metadata").get("name")},
+            "spec": {
+                "defines": {"kind": sc.get("spec", {}).get("defines", {}).get("kind")}
+            },
+        }
+
+    def load(self, context: str):
+        """Snapshot of the context, or None when there is none or it cannot be read"""
+        try:
+            with open(self.path(context), "r") as f:
+                snapshot = json.load(f)
+            if snapshot.get("version") != SNAPSHOT_VERSION:
+                return None
+            snapshot["resources"] = [
+                (
+                    tuple(r["resource"]),
+                    r["resourceVersion"],
+                    {
+                        run.uid: run
+                        for run in (RunSummary.load(values) for values in r["runs"])
+                    },
+                )
+                for r in snapshot["resources"]
+            ]
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return None
+        return snapshot
+
+    def save(self, context: str, resources, supply_chains):
+        """`resources` is a list of ((group, version, plural), resourceVersion, uid -> RunSummary)"""
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "saved": time.time(),
+            "resources": [
+                {
+                    "resource": resource,
+                    "resourceVersion": resource_version,
+                    "runs": [run.dump() for run in runs.values()],
+                }
+                for resource, resource_version, runs in resources
+            ],
+            "supply_chains": [self.compact_supply_chain(sc) for sc in supply_chains],
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Written next to the old snapshot and renamed so a crash never leaves half a file
+        tmp = self.path(context).with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp, self.path(context))
@@ -0,0 +1,113 @@
+import os
+import re
+
+import yaml
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+PLACEHOLDER = re.compile(r"%([a-z_]+)")
+
+
+class DetailTemplate:
+    """Markdown template compiled once into literal chunks and placeholder names"""
+
+    _templates = dict()
+
+    def __init__(self, text: str):
+        parts = PLACEHOLDER.split(text)
+        self.literals = parts[0::2]
+        self.names = parts[1::2]
+
+    @staticmethod
+    def load(name: str):
+        if name not in DetailTemplate._templates:
+            with open(os.path.join(TEMPLATE_DIR, name), "r") as f:
+                DetailTemplate._templates[name] = DetailTemplate(f.read())
+        return DetailTemplate._templates[name]
+
+    def render(self, values: dict):
+        out = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            out.append(str(values[name]))
+            out.append(literal)
+        return "".join(out)
+
+
+class DetailMarkdown:
+    @staticmethod
+    def stage(run_spec_stage, status_stage):
+        pipeline = run_spec_stage.get("pipeline")
+        pipeline_run = status_stage.get("pipelineRun")
+        finished = pipeline and pipeline.get("passed") is not None
+        return DetailTemplate.load("stage_detail.md").render(
+            {
+                "component_name": run_spec_stage.get("componentRef").get("name"),
+                "namespace": run_spec_stage.get("componentRef").get("namespace"),
+                "outputs": yaml.dump(
+                    run_spec_stage.get("outputs", "No Outputs to report")
+                ),
+                "pipelinerun_name": pipeline_run.get("ref").get("name")
+                if pipeline_run
+                else "PipelineRun not created",
+                "pipelinerun_ns": pipeline_run.get("ref").get("namespace")
+                if pipeline_run
+                else "PipelineRun not created",
+                "pipeline_passed": str(pipeline.get("passed", "Did not run"))
+                if finished
+                else "Stage did not run/finish",
+                "pipeline_start": pipeline.get("started")
+                if pipeline and pipeline.get("started")
+                else "Stage did not run/finish",
+                "pipeline_end": pipeline.get("completed")
+                if pipeline and pipeline.get("completed")
+                else "Stage did not run/finish",
+                "pipeline_results": yaml.dump(
+                    pipeline.get("results", "No Results to Show")
+                )
+                if finished
+                else "No Results to show",
+                "pipeline_message": pipeline.get("message")
+                if pipeline and pipeline.get("message")
+                else "Stage did not run/finish",
+            }
+        )
+
+    @staticmethod
+    def resumption(run_spec_resumption, status_resumption):
+        task_run = status_resumption.get("taskRun")
+        finished = run_spec_resumption.get("passed") is not None
+        return DetailTemplate.load("resumption_detail.md").render(
+            {
+                "resumption_stage_name": status_resumption.get("name"),
+                "resumption_name": status_resumption.get("ref").get("name"),
+                "namespace": status_resumption.get("ref").get("namespace"),
+                "key": run_spec_resumption.get("key")
+                if "key" in run_spec_resumption
+                else "Resumption did not run/finish",
+                "message": run_spec_resumption.get("message")
+                if "message" in run_spec_resumption
+                else "Resumption did not run/finish",
+                "taskrun_name": task_run.get("ref").get("name")
+                if task_run
+                else "taskRun not created",
+                "taskrun_ns": task_run.get("ref").get("namespace")
+                if task_run
+                else "taskRun not created",
+                "task_passed": str(run_spec_resumption.get("passed"))
+                if finished
+                else "Resumption did not run/finish",
+                "task_start": run_spec_resumption.get("started")
+                if run_spec_resumption.get("started")
+                else "Resumption did not run/finish",
+                "task_end": run_spec_resumption.get("completed")
+                if run_spec_resumption.get("completed")
+                else "Resumption did not run/finish",
+                "task_results": yaml.dump(
+                    run_spec_resumption.get("results", "No Results to Show")
+                )
+                if finished
+                else "No Results to show",
+                "task_digest": run_spec_resumption.get("resultDigest")
+                if run_spec_resumption.get("resultDigest")
+                else "Resumption did not run/finish",
+            }
+        )
@@ -1,7 +1,6 @@
 import emoji
 import os
-import pyperclip
-import yaml
+from functools import partial
 import re
 from rich.text import Text
 from textual.app import ComposeResult
@@ -16,12 +15,43 @@ from textual.widgets import (
     TabbedContent,
     TabPane,
     MarkdownViewer,
-    RichLog,
+    Input,
     Button,
 )
 
-from sup.k8s.k8s import KubectlCmd
-from threading import Thread
+from sup.k8s.cluster import Cluster
+from sup.k8s.informer import RunInformer
+from sup.k8s.k8s import KubectlCmd, RESUMPTION_LABEL, STAGE_LABEL
+from sup.k8s.log_cache import LogCache
+from sup.k8s.logs import PodLogStream
+from sup.k8s.run_cache import RunDetailCache
+from sup.screens.detail_markdown import DetailMarkdown
+from sup.trace import Tracer
+from sup.widgets.refresh import RefreshScheduler
+from sup.widgets.log_viewer import LogSpool, LogViewer
+from threading import Lock, Thread
+
+STATUS_ICONS = {
+    "pending": emoji.emojize(":white_circle: "),
+    "running": emoji.emojize(":blue_circle: "),
+    "passed": emoji.emojize(":green_circle: "),
+    "failed": emoji.emojize(":red_circle: "),
+}
+
+ANSI_ESCAPE = re.compile(
+    r"""
+        \x1B   # ESC
+        (?:    # 7-bit C1 Fe (except CSI)
+            [@-Z\\-_]
+        |      # or [ for CSI, followed by a control sequence
+            \[
+            [0-?]*  # Parameter bytes
+            [ -/]*  # Intermediate bytes
+            [@-~]   # Final byte
+        )
+    """,
+    re.VERBOSE,
+)
 
 
 # noinspection PyTypeChecker,PyBroadException
@@ -32,39 +62,91 @@ class RunDetail(Screen):
         ("s", "goto_stage_list", "Stage List"),
         ("d", "goto_details", "Details"),
         ("l", "goto_logs", "Logs"),
+        ("f", "toggle_follow_logs", "Follow Logs"),
+        ("e", "export_logs", "Export Log"),
+        ("/", "search_logs", "Search Log"),
     ]
 
     run_details = Reactive(dict())
 
-    def __init__(self, run: str, namespace: str):
+    def __init__(
+        self,
+        run: str,
+        namespace: str,
+        cache: RunDetailCache = None,
+        context: str = None,
+    ):
         super().__init__()
         self.run = run
+        self.context = context
+        self.run_cache = cache if cache is not None else RunDetailCache()
         self.selected_stage = dict()
         self.stage_detail: str = "Select a stage to view the details"
-        self.logs: str = "Select a stage to view the logs"
+        self.stage_detail_cache = dict()
+        self.stage_nodes = dict()
+        self.follow_logs = False
+        self.log_generation = 0
+        self.log_stream = None
+        self.log_lock = Lock()
+        self.log_cache = LogCache()
         self.namespace = namespace
         self.refresh_time_in_sec = 30
+        self.sync_time_in_sec = 1
+        kind, name = run.split("/")
+        self.informer = RunInformer(
+            kind=kind,
+            context=context,
+            namespace=namespace,
+            field_selector=f"metadata.name={name}",
+        )
+        self.synced_generation = -1
+        self.polling = not Cluster.in_process()
+        self.refresh_scheduler = RefreshScheduler(self)
 
     @staticmethod
     def remove_colorization(text):
-        ansi_escape = re.compile(
-            r"""
-                \x1B   # ESC
-                (?:    # 7-bit C1 Fe (except CSI)
-                    [@-Z\\-_]
-                |      # or [ for CSI, followed by a control sequence
-                    \[
-                    [0-?]*  # Parameter bytes
-                    [ -/]*  # Intermediate bytes
-                    [@-~]   # Final byte
-                )
-            """,
-            re.VERBOSE,
-        )
-        return ansi_escape.sub("", text)
+        return ANSI_ESCAPE.sub("", text)
 
     def action_copy_logs(self) -> None:
-        pyperclip.copy(self.remove_colorization(self.logs))
+        import pyperclip
+
+        log_viewer: LogViewer = self.query_one("#logViewer")
+        pyperclip.copy(self.remove_colorization(log_viewer.spool.text()))
+
+    def action_export_logs(self) -> None:
+        log_viewer: LogViewer = self.query_one("#logViewer")
+        path = os.path.abspath(f"{self.run.split('/')[1]}.log")
+        self.refresh_scheduler.request(
+            "export_logs",
+            partial(self.export_logs, log_viewer.spool, path),
+            lambda _: self.notify(f"Logs exported to {path}", timeout=5),
+            lambda err: self.notify(
+                f"Could not export the logs to {path}: {err}",
+                title="Export Error",
+                severity="error",
+                timeout=5,
+            ),
+        )
+
+    @staticmethod
+    def export_logs(spool: LogSpool, path: str):
+        # Streamed from the spool file in blocks, escape sequences never span lines
+        with open(path, "w") as f:
+            for block in spool.blocks():
+                f.write(ANSI_ESCAPE.sub("", block))
+
+    def action_search_logs(self):
+        self.action_goto_logs()
+        self.query_one("#logSearchInput").focus()
+
+    def action_toggle_follow_logs(self):
+        self.follow_logs = not self.follow_logs
+        self.notify(
+            "Following live logs" if self.follow_logs else "Showing log history",
+            timeout=3,
+        )
+        if self.selected_stage:
+            self.populate_logs()
 
     def action_goto_stage_list(self):
         tree = self.query_one("#stagesTree")
@@ -79,7 +161,7 @@ class RunDetail(Screen):
     def action_goto_logs(self):
         tab = self.query_one(TabbedContent)
         tab.active = "logsTab"
-        log = self.query_one(RichLog)
+        log = self.query_one(LogViewer)
         log.focus()
 
     def compose(self) -> ComposeResult:
@@ -103,19 +185,31 @@ class RunDetail(Screen):
                             id="markdownStageDetail",
                         )
                     with TabPane("Logs", id="logsTab"):
-                        yield RichLog(id="logViewer", highlight=True)
+                        yield Input(
+                            placeholder="Search logs (regex), enter for the next match",
+                            id="logSearchInput",
+                        )
+                        yield LogViewer(id="logViewer")
         yield Footer()
 
     def on_mount(self) -> None:
+        if self.polling:
+            self.update_run_details()
+        else:
+            self.informer.start()
+        # Render from the cached run right away, the informer revalidates it
+        cached = self.run_cache.get(self.namespace, self.run, self.context)
+        if cached is not None:
+            self.run_details = cached
+        self.set_interval(self.sync_time_in_sec, self.sync_run_details)
         self.set_interval(self.refresh_time_in_sec, self.update_run_details)
-        self.update_run_details()
         # Setup Markdown Viewer
         markdown: MarkdownViewer = self.query_one("#markdownStageDetail")
         markdown.show_table_of_contents = False
         markdown.show_vertical_scrollbar = True
         markdown.show_horizontal_scrollbar = False
         # Setup
-        log_viewer: RichLog = self.query_one("#logViewer")
+        log_viewer: LogViewer = self.query_one("#logViewer")
         log_viewer.show_vertical_scrollbar = True
         log_viewer.show_horizontal_scrollbar = False
 
@@ -126,7 +220,9 @@ class RunDetail(Screen):
     def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "deleteRunBtn":
             try:
-                KubectlCmd.delete_run(run=self.run, namespace=self.namespace)
+                Cluster.delete_run(
+                    run=self.run, namespace=self.namespace, context=self.context
+                )
                 self.notify(
                     f"Run {self.run} in namespace {self.namespace} was deleted.",
                     timeout=10,
@@ -147,210 +243,139 @@ class RunDetail(Screen):
             self.populate_logs()
 
     # noinspection PyUnresolvedReferences
-    def _populate_logs_handler(self):
-        log_viewer: RichLog = self.query_one("#logViewer")
-        log_viewer.clear()
+    def log_source(self):
+        if not self.selected_stage.data.get("resumption"):
+            return (
+                STAGE_LABEL,
+                self.selected_stage.data.get("status_stage").get("ref").get("name"),
+                bool(
+                    (
+                        self.selected_stage.data.get("run_spec_stage").get("pipeline")
+                        or {}
+                    ).get("completed")
+                ),
+            )
+        return (
+            RESUMPTION_LABEL,
+            self.selected_stage.data.get("status_resumption").get("ref").get("name"),
+            bool(self.selected_stage.data.get("run_spec_resumption").get("completed")),
+        )
+
+    def _pod_log_lines(self, label, obj, completed):
         try:
-            if self.selected_stage and not self.selected_stage.data.get("resumption"):
-                stage_obj = (
-                    self.selected_stage.data.get("status_stage").get("ref").get("name")
-                )
-                self.logs, cmd = KubectlCmd.get_stern_logs_for_stage(
-                    stage_obj=stage_obj
-                )
+            stream = PodLogStream(
+                label,
+                obj,
+                follow=self.follow_logs,
+                completed=completed,
+                cache=self.log_cache,
+                context=self.context,
+            )
+            return stream, stream.lines()
+        except Exception:
+            # The API client could not list the pods, fall back to stern
+            return KubectlCmd.log_lines(
+                label, obj, follow=self.follow_logs, context=self.context
+            )
+
+    def _populate_logs_handler(self, generation, spool: LogSpool):
+        with Tracer.span("populate_logs", follow=self.follow_logs) as span:
+            self._populate_logs(generation, spool, span)
+
+    def _populate_logs(self, generation, spool: LogSpool, span):
+        stream = None
+        span["lines"] = 0
+        try:
+            label, obj, completed = self.log_source()
+            if Cluster.in_process():
+                stream, lines = self._pod_log_lines(label, obj, completed)
             else:
-                resumption_obj = (
-                    self.selected_stage.data.get("status_resumption")
-                    .get("ref")
-                    .get("name")
+                stream, lines = Cluster.log_lines(
+                    label, obj, follow=self.follow_logs, context=self.context
                 )
-                self.logs, cmd = KubectlCmd.get_stern_logs_for_resumption(
-                    resumption_obj=resumption_obj
-                )
-
-            log_viewer.write(Text(self.logs))
+            # A stream started for a selection that was replaced in the meantime is
+            # terminated by the finally block, it must not replace the current one
+            with self.log_lock:
+                if generation != self.log_generation:
+                    return
+                self.log_stream = stream
+            for line in lines:
+                if generation != self.log_generation:
+                    break
+                spool.append(line.rstrip("\n"))
+                span["lines"] += 1
         except Exception:
-            log_viewer.write(
-                Text(
-                    "Could not get logs. Please make sure [bold]stern[/bold] CLI is installed."
-                )
-            )
+            if generation != self.log_generation:
+                return
+            spool.append("Could not get logs from the cluster or with the stern CLI.")
             self.notify(
                 "Sup was unable to get logs from the cluster. Make sure the cluster is accessible and the kubeconfig is valid.",
                 title="Refresh Error",
                 severity="error",
                 timeout=self.refresh_time_in_sec,
             )
+        finally:
+            if stream is not None:
+                stream.terminate()
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        if event.input.id == "logSearchInput":
+            log_viewer: LogViewer = self.query_one("#logViewer")
+            log_viewer.search(event.value)
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        if event.input.id == "logSearchInput":
+            log_viewer: LogViewer = self.query_one("#logViewer")
+            log_viewer.action_next_match()
+
+    def stop_log_stream(self):
+        with self.log_lock:
+            if self.log_stream is not None:
+                self.log_stream.terminate()
+                self.log_stream = None
+            self.log_generation += 1
 
     def populate_logs(self):
-        t = Thread(target=self._populate_logs_handler)
+        self.stop_log_stream()
+        log_viewer: LogViewer = self.query_one("#logViewer")
+        log_viewer.clear()
+        t = Thread(
+            target=self._populate_logs_handler,
+            args=(self.log_generation, log_viewer.spool),
+            daemon=True,
+        )
         t.start()
 
     # noinspection PyUnresolvedReferences
+    @Tracer.traced("populate_stage_details")
     def populate_stage_details(self):
         mkd: MarkdownViewer = self.query_one("#markdownStageDetail")
         mkd.show_table_of_contents = True
         try:
-            if self.selected_stage and not self.selected_stage.data.get("resumption"):
-                path = os.path.dirname(os.path.abspath(__file__)).replace(
-                    "/screens", f"/templates/stage_detail.md"
-                )
-                tpl = open(path, "r").read()
-                run_spec_stage = self.selected_stage.data.get("run_spec_stage")
-                status_stage = self.selected_stage.data.get("status_stage")
-                final_data = (
-                    str(tpl)
-                    .replace(
-                        "%component_name",
-                        run_spec_stage.get("componentRef").get("name"),
-                    )
-                    .replace(
-                        "%namespace",
-                        run_spec_stage.get("componentRef").get("namespace"),
-                    )
-                    .replace(
-                        "%outputs",
-                        yaml.dump(
-                            run_spec_stage.get("outputs", "No Outputs to report")
-                        ),
-                    )
-                    .replace(
-                        "%pipelinerun_name",
-                        status_stage.get("pipelineRun").get("ref").get("name")
-                        if status_stage.get("pipelineRun")
-                        else "PipelineRun not created",
-                    )
-                    .replace(
-                        "%pipelinerun_ns",
-                        status_stage.get("pipelineRun").get("ref").get("namespace")
-                        if status_stage.get("pipelineRun")
-                        else "PipelineRun not created",
-                    )
-                    .replace(
-                        "%pipeline_passed",
-                        str(run_spec_stage.get("pipeline").get("passed", "Did not run"))
-                        if run_spec_stage.get("pipeline")
-                        and run_spec_stage.get("pipeline").get("passed") is not None
-                        else "Stage did not run/finish",
-                    )
-                    .replace(
-                        "%pipeline_start",
-                        run_spec_stage.get("pipeline").get("started", "Did not run")
-                        if run_spec_stage.get("pipeline")
-                        and run_spec_stage.get("pipeline").get("started")
-                        else "Stage did not run/finish",
-                    )
-                    .replace(
-                        "%pipeline_end",
-                        run_spec_stage.get("pipeline").get("completed", "Did not run")
-                        if run_spec_stage.get("pipeline")
-                        and run_spec_stage.get("pipeline").get("completed")
-                        else "Stage did not run/finish",
-                    )
-                    .replace(
-                        "%pipeline_results",
-                        yaml.dump(
-                            run_spec_stage.get("pipeline").get(
-                                "results", "No Results to Show"
-                            )
-                        )
-                        if run_spec_stage.get("pipeline")
-                        and run_spec_stage.get("pipeline").get("passed") is not None
-                        else "No Results to show",
-                    )
-                    .replace(
-                        "%pipeline_message",
-                        run_spec_stage.get("pipeline").get("message", "Did not run")
-                        if run_spec_stage.get("pipeline")
-                        and run_spec_stage.get("pipeline").get("message")
-                        else "Stage did not run/finish",
-                    )
-                )
+            data = self.selected_stage.data
+            if not data.get("resumption"):
+                key = (data.get("run_spec_stage").get("name"), None)
             else:
-                path = os.path.dirname(os.path.abspath(__file__)).replace(
-                    "/screens", f"/templates/resumption_detail.md"
-                )
-                tpl = open(path, "r").read()
-                run_spec_resumption = self.selected_stage.data.get(
-                    "run_spec_resumption"
+                key = (
+                    self.selected_stage.parent.data.get("run_spec_stage").get("name"),
+                    data.get("run_spec_resumption").get("name"),
                 )
-                status_resumption = self.selected_stage.data.get("status_resumption")
-
-                final_data = (
-                    str(tpl)
-                    .replace(
-                        "%resumption_stage_name",
-                        status_resumption.get("name"),
-                    )
-                    .replace(
-                        "%resumption_name",
-                        status_resumption.get("ref").get("name"),
-                    )
-                    .replace(
-                        "%namespace",
-                        status_resumption.get("ref").get("namespace"),
-                    )
-                    .replace(
-                        "%key",
-                        run_spec_resumption.get("key")
-                        if "key" in run_spec_resumption
-                        else "Resumption did not run/finish",
-                    )
-                    .replace(
-                        "%message",
-                        run_spec_resumption.get("message")
-                        if "message" in run_spec_resumption
-                        else "Resumption did not run/finish",
-                    )
-                    .replace(
-                        "%taskrun_name",
-                        status_resumption.get("taskRun").get("ref").get("name")
-                        if status_resumption.get("taskRun")
-                        else "taskRun not created",
+            # Rendered pages only change when the run does
+            key = (self.run_details.get("metadata", {}).get("resourceVersion"),) + key
+            if key not in self.stage_detail_cache:
+                if not data.get("resumption"):
+                    self.stage_detail_cache[key] = DetailMarkdown.stage(
+                        data.get("run_spec_stage"), data.get("status_stage")
                     )
-                    .replace(
-                        "%taskrun_ns",
-                        status_resumption.get("taskRun").get("ref").get("namespace")
-                        if status_resumption.get("taskRun")
-                        else "taskRun not created",
+                else:
+                    self.stage_detail_cache[key] = DetailMarkdown.resumption(
+                        data.get("run_spec_resumption"), data.get("status_resumption")
                     )
-                    .replace(
-                        "%task_passed",
-                        str(run_spec_resumption.get("passed", "Did not run"))
-                        if run_spec_resumption.get("passed") is not None
-                        else "Resumption did not run/finish",
-                    )
-                    .replace(
-                        "%task_start",
-                        run_spec_resumption.get("started", "Did not run")
-                        if run_spec_resumption.get("started")
-                        else "Resumption did not run/finish",
-                    )
-                    .replace(
-                        "%task_end",
-                        run_spec_resumption.get("completed", "Did not run")
-                        if run_spec_resumption.get("completed")
-                        else "Resumption did not run/finish",
-                    )
-                    .replace(
-                        "%task_results",
-                        yaml.dump(
-                            run_spec_resumption.get("results", "No Results to Show")
-                        )
-                        if run_spec_resumption.get("passed") is not None
-                        else "No Results to show",
-                    )
-                    .replace(
-                        "%task_digest",
-                        run_spec_resumption.get("resultDigest", "Did not run")
-                        if run_spec_resumption.get("resultDigest")
-                        else "Resumption did not run/finish",
-                    )
-                )
+            final_data = self.stage_detail_cache[key]
 
-            self.stage_detail = final_data
-            mkd.document.update(self.stage_detail)
-            mkd.document.refresh(layout=True, recompose=True)
+            if final_data != self.stage_detail:
+                self.stage_detail = final_data
+                mkd.document.update(self.stage_detail)
         except Exception as err:
             self.notify(
                 f"Sup was unable to get Stage/Resumption details from the cluster. Error {err}",
@@ -359,81 +384,94 @@ class RunDetail(Screen):
                 timeout=self.refresh_time_in_sec,
             )
 
+    @staticmethod
+    def stage_icon(pending, started, completed, passed):
+        if pending:
+            return STATUS_ICONS["pending"]
+        if started and not completed:
+            return STATUS_ICONS["running"]
+        if passed is True:
+            return STATUS_ICONS["passed"]
+        return STATUS_ICONS["failed"]
+
+    def reconcile_node(self, key, parent, label, data):
+        """Update the node for `key` in place, adding it under `parent` when it is new"""
+        node = self.stage_nodes.get(key)
+        if node is None:
+            node = parent.add_leaf(label, data)
+        else:
+            if node.label.plain != label:
+                node.set_label(label)
+            node.data = data
+        return node
+
+    @Tracer.traced("populate_stage_tree")
     def populate_stage_tree(self):
         tree: Tree = self.query_one("#stagesTree")
-        tree.clear()
         stages_node = tree.root
         stages_node.expand()
-        ct = 0
-        for run_spec_stage in (
+        status_stages = self.run_details.get("status").get("stages", [])
+        stage_nodes = dict()
+        for ct, run_spec_stage in enumerate(
             self.run_details.get("status").get("workloadRun").get("spec").get("stages")
         ):
-            if not run_spec_stage.get("pipeline"):
-                ej = emoji.emojize(":white_circle: ")
-                status_stage = {}
-            elif run_spec_stage.get("pipeline").get(
-                "started"
-            ) and not run_spec_stage.get("pipeline").get("completed"):
-                ej = emoji.emojize(":blue_circle: ")
-                status_stage = self.run_details.get("status").get("stages", [])[ct]
-            elif (
-                run_spec_stage.get("pipeline").get("passed")
-                and run_spec_stage.get("pipeline").get("passed") is True
-            ):
-                ej = emoji.emojize(":green_circle: ")
-                status_stage = self.run_details.get("status").get("stages", [])[ct]
-            else:
-                ej = emoji.emojize(":red_circle: ")
-                status_stage = self.run_details.get("status").get("stages", [])[ct]
+            pipeline = run_spec_stage.get("pipeline") or {}
+            ej = self.stage_icon(
+                not pipeline,
+                pipeline.get("started"),
+                pipeline.get("completed"),
+                pipeline.get("passed"),
+            )
+            status_stage = status_stages[ct] if pipeline else {}
 
-            stg_node = stages_node.add_leaf(
-                ej + run_spec_stage.get("name"),
+            stage_name = run_spec_stage.get("name")
+            stg_node = self.reconcile_node(
+                stage_name,
+                stages_node,
+                ej + stage_name,
                 {
                     "run_spec_stage": run_spec_stage,
                     "status_stage": status_stage,
                     "resumption": False,
                 },
             )
-
-            if run_spec_stage.get("resumptions"):
-                rct = 0
-                for r in run_spec_stage.get("resumptions"):
-                    if not r.get("started") and not r.get("completed"):
-                        ej = emoji.emojize(":white_circle: ")
-                        status_resumption = {}
-                    elif r.get("started") and not r.get("completed"):
-                        ej = emoji.emojize(":blue_circle: ")
-                        status_resumption = (
-                            self.run_details.get("status")
-                            .get("stages", [])[ct]
-                            .get("resumptions", [])[rct]
-                        )
-                    elif r.get("passed") and r.get("passed") is True:
-                        ej = emoji.emojize(":green_circle: ")
-                        status_resumption = (
-                            self.run_details.get("status")
-                            .get("stages", [])[ct]
-                            .get("resumptions", [])[rct]
-                        )
-                    else:
-                        ej = emoji.emojize(":red_circle: ")
-                        status_resumption = (
-                            self.run_details.get("status")
-                            .get("stages", [])[ct]
-                            .get("resumptions", [])[rct]
-                        )
-
-                    stg_node.add_leaf(
-                        ej + r.get("name"),
-                        {
-                            "run_spec_resumption": r,
-                            "resumption": True,
-                            "status_resumption": status_resumption,
-                        },
+            stage_nodes[stage_name] = stg_node
+
+            for rct, r in enumerate(run_spec_stage.get("resumptions") or []):
+                if not r.get("started") and not r.get("completed"):
+                    status_resumption = {}
+                else:
+                    status_resumption = status_stages[ct].get("resumptions", [])[rct]
+                if not stg_node.children:
+                    # Expanded once when its first resumption shows up
+                    stg_node.allow_expand = True
+                    stg_node.expand()
+                key = (stage_name, r.get("name"))
+                stage_nodes[key] = self.reconcile_node(
+                    key,
+                    stg_node,
+                    self.stage_icon(
+                        not r.get("started") and not r.get("completed"),
+                        r.get("started"),
+                        r.get("completed"),
+                        r.get("passed"),
                     )
-                    stg_node.expand_all()
-                    rct += 1
-            ct += 1
+                    + r.get("name"),
+                    {
+                        "run_spec_resumption": r,
+                        "resumption": True,
+                        "status_resumption": status_resumption,
+                    },
+                )
+
+        for key in self.stage_nodes.keys() - stage_nodes.keys():
+            node = self.stage_nodes[key]
+            if node is self.selected_stage:
+                self.selected_stage = dict()
+            # Resumptions of a removed stage go away with their parent node
+            if isinstance(key, str) or key[0] in stage_nodes:
+                node.remove()
+        self.stage_nodes = stage_nodes
 
     def populate_top_bar(self):
         self.query_one("#runLabel").renderable = (
@@ -443,6 +481,10 @@ class RunDetail(Screen):
             + Text(f"{self.namespace}", style="bold #ffffff")
             + " namespace"
         )
+        if self.context:
+            self.query_one("#runLabel").renderable += " of " + Text(
+                f"{self.context}", style="bold #ffffff"
+            )
 
         msg = str(
             self.run_details.get("status")
@@ -489,22 +531,48 @@ class RunDetail(Screen):
             style="bold #ffffff",
         )
 
-    def _update_run_details_handler(self):
-        try:
-            self.run_details = KubectlCmd.get_run_detail(self.run, self.namespace)
-        except Exception:
-            self.notify(
-                "Sup was unable to get Run details from the cluster. Make sure the cluster is accessible and the kubeconfig is valid.",
-                title="Refresh Error",
-                severity="error",
-                timeout=self.refresh_time_in_sec,
-            )
+    def on_unmount(self) -> None:
+        self.informer.stop()
+        self.stop_log_stream()
+
+    def sync_run_details(self):
+        if self.informer.error is not None and not self.polling:
+            # The API client could not start, fall back to polling kubectl
+            self.polling = True
+            self.update_run_details()
+        if self.informer.generation == self.synced_generation:
+            return
+        self.synced_generation = self.informer.generation
+        items = self.informer.items()
+        if items:
+            self.run_cache.put(items[0], self.context)
+            self.run_details = items[0]
+
+    def _refresh_error_handler(self, _):
+        self.notify(
+            "Sup was unable to get Run details from the cluster. Make sure the cluster is accessible and the kubeconfig is valid.",
+            title="Refresh Error",
+            severity="error",
+            timeout=self.refresh_time_in_sec,
+        )
+
+    def _set_run_details(self, run_details):
+        self.run_cache.put(run_details, self.context)
+        self.run_details = run_details
 
     def update_run_details(self):
-        t = Thread(target=self._update_run_details_handler)
-        t.run()
+        if not self.polling:
+            return
+        self.refresh_scheduler.request(
+            "run_details",
+            partial(Cluster.get_run_detail, self.run, self.namespace, self.context),
+            self._set_run_details,
+            self._refresh_error_handler,
+        )
 
     def watch_run_details(self):
+        # Pages of older resourceVersions can never be hit again
+        self.stage_detail_cache.clear()
         self.populate_stage_tree()
         self.populate_top_bar()
         if self.selected_stage:
@@ -0,0 +1,53 @@
+class RunSearchIndex:
+    """Search index over the `workload/run` names of the loaded runs.
+
+    Keys are lowercased once when the index is built and the results of recent
+    queries are kept, so a query that contains an earlier one (the user typed
+    another character, or backspaced to a query seen before) only rescans the
+    earlier matches instead of every run.
+    """
+
+    def __init__(self, keys: dict, max_cached_queries: int = 64):
+        self.keys = {uid: key.lower() for uid, key in keys.items()}
+        self.max_cached_queries = max_cached_queries
+        self._results = {("", False): list(self.keys)}
+
+    @staticmethod
+    def is_subsequence(query, key):
+        position = 0
+        for char in query:
+            position = key.find(char, position) + 1
+            if not position:
+                return False
+        return True
+
+    def candidates(self, query, fuzzy):
+        # Every match of a query also matches any query it contains, a fuzzy
+        # query can only be narrowed from one of its prefixes
+        best = self._results[("", False)]
+        for (cached, cached_fuzzy), result in self._results.items():
+            if cached_fuzzy != fuzzy or len(result) >= len(best):
+                continue
+            if query.startswith(cached) or (not fuzzy and cached in query):
+                best = result
+        return best
+
+    def search(self, query: str, fuzzy: bool = False):
+        query = query.lower()
+        if (query, fuzzy) in self._results:
+            return self._results[(query, fuzzy)]
+        if fuzzy:
+            result = [
+                uid
+                for uid in self.candidates(query, fuzzy)
+                if self.is_subsequence(query, self.keys[uid])
+            ]
+        else:
+            result = [
+                uid for uid in self.candidates(query, fuzzy) if query in self.keys[uid]
+            ]
+        if len(self._results) > self.max_cached_queries:
+            # Oldest query after the empty one is evicted first
+            del self._results[list(self._results)[1]]
+        self._results[(query, fuzzy)] = result
+        return result
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Durations kept per span for the percentiles of the perf panel
+HISTORY = 100
+PERCENTILES = (0.5, 0.95, 0.99)
+# Events kept for `--trace`, later ones are only counted
+TRACE_LIMIT = 500_000
+
+
+class Tracer:
+    """Timing spans around the hot paths, from the kubectl process to the table.
+
+    The durations of the last HISTORY occurrences of every span are always kept,
+    that costs two clock reads and a deque append per span. Every event is only
+    kept once `start_trace` was called, `write_trace` saves them in the Chrome
+    trace format that chrome://tracing and ui.perfetto.dev open.
+    """
+
+    _lock = threading.Lock()
+    _spans = dict()
+    _events = None
+    _threads = dict()
+    _dropped = 0
+    _origin = time.perf_counter_ns()
+
+    @staticmethod
+    def record(name: str, start_ns: int, end_ns: int, args: dict = None):
+        with Tracer._lock:
+            span = Tracer._spans.get(name)
+            if span is None:
+                span = Tracer._spans[name] = [0, deque(maxlen=HISTORY)]
+            span[0] += 1
+            span[1].append((end_ns - start_ns) / 1e6)
+            if Tracer._events is None:
+                return
+            if len(Tracer._events) >= TRACE_LIMIT:
+                Tracer._dropped += 1
+                return
+            thread = threading.current_thread()
+            Tracer._threads[thread.ident] = thread.name
+            Tracer._events.append(
+                {
+                    "name": name,
+                    "cat": name.split(".")[0],
+                    "ph": "X",
+                    "ts": (start_ns - Tracer._origin) / 1e3,
+                    "dur": (end_ns - start_ns) / 1e3,
+                    "pid": os.getpid(),
+                    "tid": thread.ident,
+                    "args": args or {},
+                }
+            )
+
+    @staticmethod
+    @contextmanager
+    def span(name: str, **args):
+        """Time the block, the yielded args can be added to before it ends"""
+        start = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            Tracer.record(name, start, time.perf_counter_ns(), args)
+
+    @staticmethod
+    def traced(name: str):
+        """Decorator that times every call of a function as span `name`"""
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    Tracer.record(name, start, time.perf_counter_ns())
+
+            return wrapper
+
+        return decorator
+
+    @staticmethod
+    def start_trace():
+        with Tracer._lock:
+            Tracer._events = list()
+            Tracer._threads = dict()
+            Tracer._dropped = 0
+
+    @staticmethod
+    def stats():
+        """name -> (count, last, p50, p95, p99, max) in ms, over the last HISTORY spans"""
+        with Tracer._lock:
+            spans = {
+                name: (count, list(d)) for name, (count, d) in Tracer._spans.items()
+            }
+        stats = dict()
+        for name, (count, durations) in sorted(spans.items()):
+            ordered = sorted(durations)
+            stats[name] = (
+                count,
+                durations[-1],
+                *(
+                    ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+                    for p in PERCENTILES
+                ),
+                ordered[-1],
+            )
+        return stats
+
+    @staticmethod
+    def write_trace(path: str):
+        with Tracer._lock:
+            events = list(Tracer._events or [])
+            threads = dict(Tracer._threads)
+            dropped = Tracer._dropped
+        names = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": ident,
+                "args": {"name": name},
+            }
+            for ident, name in threads.items()
+        ]
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "traceEvents": names + events,
+                    "displayTimeUnit": "ms",
+                    "otherData": {"dropped_events": dropped},
+                },
+                f,
+            )
@@ -0,0 +1,269 @@
+import mmap
+import re
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import partial
+from threading import Lock
+
+from rich.highlighter import ReprHighlighter
+from rich.text import Text
+from textual.binding import Binding
+from textual.geometry import Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+# Bytes searched per step, the spool lock is released and a cancelled search
+# stops between steps
+SEARCH_CHUNK_SIZE = 4 << 20
+
+
+class LogSpool:
+    """Log lines spooled to a temporary file with an index of line start offsets.
+
+    Writers append from a background thread while the viewer reads single lines
+    and runs searches against a memory map of the file, so memory use does not
+    grow with the size of the log.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._offsets = array("Q", [0])
+        self._mmap = None
+        self._lock = Lock()
+        self.width = 0
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def append(self, line: str):
+        data = line.encode("utf-8", errors="replace") + b"\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+            self.width = max(self.width, len(line))
+
+    def _mapped(self):
+        # Called with the lock held, the map is recreated when the file has grown
+        size = self._offsets[-1]
+        if size == 0:
+            return None
+        if self._mmap is None or len(self._mmap) < size:
+            self._file.flush()
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def line(self, index: int):
+        with self._lock:
+            mapped = self._mapped()
+            start, end = self._offsets[index], self._offsets[index + 1] - 1
+            return mapped[start:end].decode("utf-8", errors="replace")
+
+    def find(
+        self, pattern: re.Pattern, lo: int, hi: int, backwards=False, cancelled=None
+    ):
+        """Index of the first line in [lo, hi) that matches, the last one when backwards.
+
+        The lines are searched in chunks of SEARCH_CHUNK_SIZE bytes, appends and
+        rendering go on in between and None is returned once `cancelled()` is true.
+        """
+        while lo < hi:
+            if cancelled is not None and cancelled():
+                return None
+            with self._lock:
+                if self._file.closed:
+                    return None
+                mapped = self._mapped()
+                offsets = self._offsets
+                if backwards:
+                    chunk = bisect_left(offsets, offsets[hi] - SEARCH_CHUNK_SIZE)
+                    chunk = max(lo, min(hi - 1, chunk))
+                    match = None
+                    for match in pattern.finditer(mapped, offsets[chunk], offsets[hi]):
+                        pass
+                    if match is not None:
+                        return min(hi - 1, bisect_right(offsets, match.start()) - 1)
+                    hi = chunk
+                else:
+                    chunk = bisect_left(offsets, offsets[lo] + SEARCH_CHUNK_SIZE)
+                    chunk = min(hi, max(lo + 1, chunk))
+                    match = pattern.search(mapped, offsets[lo], offsets[chunk])
+                    if match is not None:
+                        return min(chunk - 1, bisect_right(offsets, match.start()) - 1)
+                    lo = chunk
+        return None
+
+    def lines(self):
+        for index in range(len(self)):
+            yield self.line(index)
+
+    def blocks(self):
+        """The text of the lines in blocks of about SEARCH_CHUNK_SIZE bytes of whole lines"""
+        index = 0
+        while index < len(self):
+            with self._lock:
+                if self._file.closed:
+                    return
+                mapped = self._mapped()
+                offsets = self._offsets
+                end = bisect_left(offsets, offsets[index] + SEARCH_CHUNK_SIZE)
+                end = min(len(offsets) - 1, max(index + 1, end))
+                block = mapped[offsets[index] : offsets[end]]
+            yield block.decode("utf-8", errors="replace")
+            index = end
+
+    def text(self):
+        with self._lock:
+            mapped = self._mapped()
+            return "" if mapped is None else mapped[:].decode("utf-8", errors="replace")
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+            self._file.close()
+
+
+class LogViewer(ScrollView, can_focus=True):
+    """Log view that renders only the visible lines of a LogSpool"""
+
+    BINDINGS = [
+        Binding("n", "next_match", "Next Match"),
+        Binding("N", "previous_match", "Previous Match"),
+    ]
+
+    def __init__(self, *, name=None, id=None, classes=None):
+        super().__init__(name=name, id=id, classes=classes)
+        self.sync_time_in_sec = 1 / 30
+        self.spool = LogSpool()
+        self.highlighter = ReprHighlighter()
+        self.pattern = None
+        self.match_line = None
+        self.search_debounce_in_sec = 0.1
+        self.search_timer = None
+        self.search_generation = 0
+        self._line_count = 0
+
+    def on_mount(self) -> None:
+        self.set_interval(self.sync_time_in_sec, self.sync)
+
+    def on_unmount(self) -> None:
+        self.spool.close()
+
+    def clear(self):
+        self.spool.close()
+        self.spool = LogSpool()
+        self.match_line = None
+        self.search_generation += 1
+        self._line_count = 0
+        self.virtual_size = Size(0, 0)
+        self.refresh()
+
+    def sync(self):
+        """Pick up the lines appended to the spool since the last frame in one go"""
+        line_count = len(self.spool)
+        if line_count == self._line_count:
+            return
+        at_end = self.scroll_y >= self.max_scroll_y
+        self._line_count = line_count
+        self.virtual_size = Size(self.spool.width, line_count)
+        if at_end and not self.is_vertical_scrollbar_grabbed:
+            self.scroll_end(animate=False)
+        self.refresh()
+
+    @staticmethod
+    def compile(query: str):
+        """Case insensitive pattern of `query` for a spool search, None when it is not valid"""
+        try:
+            return re.compile(query.encode(), re.IGNORECASE | re.MULTILINE)
+        except re.error:
+            return None
+
+    def search(self, query: str):
+        """Search from the top line on screen once the typing pauses"""
+        # A search still running for the previous query is cancelled right away
+        self.search_generation += 1
+        if self.search_timer is not None:
+            self.search_timer.stop()
+        self.search_timer = self.set_timer(
+            self.search_debounce_in_sec, partial(self.start_search, query)
+        )
+
+    def start_search(self, query: str):
+        self.search_timer = None
+        self.pattern = self.compile(query) if query else None
+        if self.pattern is None:
+            self.search_generation += 1
+            self.match_line = None
+            self.refresh()
+            return
+        self.jump_to_match(int(self.scroll_y))
+
+    def jump_to_match(self, start: int, backwards=False):
+        """Search in a thread worker from `start` and wrap around to the other end"""
+        self.search_generation += 1
+        line_count = len(self.spool)
+        if self.pattern is None or not line_count:
+            return
+        if backwards:
+            split = min(max(start + 1, 0), line_count)
+            ranges = ((0, split), (split, line_count))
+        else:
+            split = min(max(start, 0), line_count)
+            ranges = ((split, line_count), (0, split))
+        self.run_worker(
+            partial(
+                self._search_handler,
+                self.search_generation,
+                self.spool,
+                self.pattern,
+                ranges,
+                backwards,
+            ),
+            group="log_search",
+            exit_on_error=False,
+            thread=True,
+        )
+
+    def _search_handler(self, generation, spool, pattern, ranges, backwards):
+        cancelled = lambda: generation != self.search_generation  # noqa: E731
+        found = None
+        for lo, hi in ranges:
+            found = spool.find(pattern, lo, hi, backwards, cancelled)
+            if found is not None or cancelled():
+                break
+        self.app.call_from_thread(self._show_match, generation, found)
+
+    def _show_match(self, generation, found):
+        if generation != self.search_generation:
+            return
+        self.match_line = found
+        if found is not None:
+            self.scroll_to(y=max(0, found - self.size.height // 2), animate=False)
+        self.refresh()
+
+    def action_next_match(self):
+        if self.match_line is not None:
+            self.jump_to_match(self.match_line + 1)
+
+    def action_previous_match(self):
+        if self.match_line is not None:
+            self.jump_to_match(self.match_line - 1, backwards=True)
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        index = scroll_y + y
+        width = self.size.width
+        rich_style = self.rich_style
+        if index >= self._line_count:
+            return Strip.blank(width, rich_style)
+        text = Text.from_ansi(self.spool.line(index), style=rich_style, no_wrap=True)
+        text = self.highlighter(text)
+        if index == self.match_line:
+            text.stylize("reverse")
+        strip = Strip(text.render(self.app.console), text.cell_len)
+        return strip.crop_extend(scroll_x, scroll_x + width, rich_style)
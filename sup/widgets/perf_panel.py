@@ -0,0 +1,36 @@
+from rich.text import Text
+from textual.widgets import DataTable
+
+from sup.trace import HISTORY, Tracer
+
+COLUMNS = ("span", "count", "last", "p50", "p95", "p99", "max")
+
+
+class PerfPanel(DataTable):
+    """Durations of the timing spans, in ms over the last HISTORY of each, refreshed every second"""
+
+    def __init__(self, refresh_time_in_sec: float = 1):
+        super().__init__(cursor_type="none", zebra_stripes=True)
+        self.refresh_time_in_sec = refresh_time_in_sec
+        self.border_title = f"Spans (ms, last {HISTORY})"
+        self.shown = dict()
+
+    def on_mount(self) -> None:
+        for column in COLUMNS:
+            self.add_column(column, key=column)
+        self.update_stats()
+        self.set_interval(self.refresh_time_in_sec, self.update_stats)
+
+    def update_stats(self):
+        for name, (count, *durations) in Tracer.stats().items():
+            values = (str(count),) + tuple(f"{ms:.1f}" for ms in durations)
+            previous = self.shown.get(name)
+            if previous is None:
+                self.add_row(
+                    name, *(Text(v, justify="right") for v in values), key=name
+                )
+            elif previous != values:
+                for column, old, new in zip(COLUMNS[1:], previous, values):
+                    if old != new:
+                        self.update_cell(name, column, Text(new, justify="right"))
+            self.shown[name] = values
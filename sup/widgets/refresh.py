@@ -0,0 +1,57 @@
+from functools import partial
+
+from sup.trace import Tracer
+
+
+# noinspection PyBroadException
+class RefreshScheduler:
+    """Runs fetches in Textual thread workers with at most one in-flight fetch per resource.
+
+    A request that arrives while a fetch of the same resource is in flight is queued
+    and further requests replace the queued one, so a burst of requests costs at most
+    one follow-up fetch. Every request bumps the resource's generation and the result
+    of a superseded fetch is dropped instead of overwriting newer data.
+    """
+
+    def __init__(self, node):
+        self.node = node
+        self.generations = dict()
+        self.in_flight = dict()
+        self.pending = dict()
+
+    def request(self, resource: str, fetch, apply, on_error=None):
+        generation = self.generations.get(resource, 0) + 1
+        self.generations[resource] = generation
+        job = (generation, fetch, apply, on_error)
+        if resource in self.in_flight:
+            self.pending[resource] = job
+            return
+        self._start(resource, job)
+
+    def _start(self, resource, job):
+        self.in_flight[resource] = self.node.run_worker(
+            partial(self._fetch_handler, resource, job),
+            group=resource,
+            exit_on_error=False,
+            thread=True,
+        )
+
+    def _fetch_handler(self, resource, job):
+        _, fetch, _, _ = job
+        try:
+            with Tracer.span(f"refresh.{resource}"):
+                result, error = fetch(), None
+        except Exception as err:
+            result, error = None, err
+        self.node.app.call_from_thread(self._done, resource, job, result, error)
+
+    def _done(self, resource, job, result, error):
+        generation, _, apply, on_error = job
+        self.in_flight.pop(resource, None)
+        if generation == self.generations.get(resource):
+            if error is None:
+                apply(result)
+            elif on_error is not None:
+                on_error(error)
+        if resource in self.pending:
+            self._start(resource, self.pending.pop(resource))
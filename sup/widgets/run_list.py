@@ -1,8 +1,10 @@
 import time
+from functools import partial
 
 from textual import on
 from textual.app import ComposeResult
 from textual.binding import Binding
+from textual.coordinate import Coordinate
 from textual.containers import Vertical, Horizontal
 from textual.reactive import Reactive
 from textual.widgets import (
@@ -13,10 +15,68 @@ from textual.widgets import (
     Label,
     Select,
 )
-from sup.k8s.k8s import KubectlCmd
+from sup.k8s.cluster import Cluster
+from sup.k8s.informer import ClusterInformers, RunInformer
+from sup.k8s.k8s import KubectlCmd, CLUSTER_COLUMN, RUN_COLUMNS, RunSummary
+from sup.k8s.run_cache import RunDetailCache
+from sup.k8s.snapshot import RunSnapshot
+from rich.cells import cell_len
+from rich.measure import Measurement
 from rich.text import Text
-from sup.screens.run_details import RunDetail
-from threading import Thread
+from sup.search.run_index import RunSearchIndex
+from sup.trace import Tracer
+from sup.widgets.refresh import RefreshScheduler
+
+STATUS_STYLES = {
+    "Succeeded": "italic #03AC13",
+    "Failed": "italic #d1573f",
+    "PlatformFailed": "italic #fc9847",
+}
+PROGRESS_STYLES = {"✓": "bold #22c91c", "X": "bold #c91c28", "-": "bold #ffffff"}
+
+
+class RunCell:
+    """Run table cell that only builds its styled Text once the DataTable draws it"""
+
+    __slots__ = ("column", "plain", "_text")
+
+    def __init__(self, column: str, plain: str):
+        self.column = column
+        self.plain = plain
+        self._text = None
+
+    def __rich_measure__(self, console, options):
+        width = cell_len(self.plain)
+        return Measurement(width, width)
+
+    def __rich_console__(self, console, options):
+        if self._text is None:
+            self._text = self.styled()
+        yield self._text
+
+    def styled(self):
+        if self.column in ("namespace", CLUSTER_COLUMN):
+            return Text(self.plain, style="#96999e")
+        if self.column == "supplychain":
+            return Text(self.plain, style="italic #ffffff")
+        if self.column == "run":
+            workload, _, name = self.plain.partition("/")
+            return (
+                Text(workload, style="#dbce0d")
+                + "/"
+                + Text(name, style="italic #ffffff")
+            )
+        if self.column == "ready":
+            return Text(
+                self.plain,
+                style=STATUS_STYLES.get(self.plain, "italic #3f9bd1"),
+                justify="right",
+            )
+        if self.column == "progress":
+            return Text.assemble(
+                *((mark, PROGRESS_STYLES[mark]) for mark in self.plain)
+            )
+        return Text(self.plain, style="#ffffff")
 
 
 class RunList(Static):
@@ -29,10 +89,51 @@ class RunList(Static):
     selected_status = Reactive(str())
     latest_run = Reactive(bool)
 
-    def __init__(self):
+    def __init__(self, contexts=None, namespaces=None, namespaced=False):
         super().__init__()
         self.refresh_time_in_sec = 30
-        self.start = time.time()
+        self.sync_time_in_sec = 1
+        self.cluster_timeout_in_sec = 20
+        # None stands for the kubeconfig's current context
+        self.contexts = list(contexts) if contexts else [None]
+        self.columns = RUN_COLUMNS
+        if len(self.contexts) > 1:
+            self.columns = (CLUSTER_COLUMN,) + RUN_COLUMNS
+        # Runs are listed namespace by namespace instead of cluster-wide, in the
+        # given namespaces or in every namespace of a cluster that can be listed
+        self.namespaces = namespaces
+        self.namespaced = namespaced or bool(namespaces)
+        self.polling_only = self.namespaced or not Cluster.in_process()
+        self.snapshot = RunSnapshot()
+        self.snapshot_contexts = dict()
+        self.stale = False
+        self.informer = self.new_informer(restore=True)
+        self.polled_contexts = set()
+        self.polled_selector = None
+        self.polled_runs = dict()
+        self.poll_errors = dict()
+        self.cluster_errors = dict()
+        self.synced_generation = -1
+        self.chain_options = list()
+        # Rows in the table in table order, the keys and rows they were rendered from
+        self.rendered_rows = dict()
+        self.rendered_keys = list()
+        self.rendered_from = None
+        # Rows of the last render still to be added, see add_pending_rows
+        self.render_generation = 0
+        self.pending_rows = list()
+        self.pending_cursor = None
+        self.rows_per_frame = 300
+        # Removed rows times table rows above which the table is rebuilt, see render_rows
+        self.rebuild_ratio = 10
+        self.run_rows = dict()
+        self.run_summaries = dict()
+        self.run_cache = RunDetailCache()
+        self.prefetch_rows = 2
+        self.search_index = RunSearchIndex(dict())
+        self.filter_debounce_in_sec = 0.1
+        self.filter_timer = None
+        self.refresh_scheduler = RefreshScheduler(self)
 
     BINDINGS = [
         Binding("ctrl+c", "app.quit", "Quit"),
@@ -68,25 +169,23 @@ class RunList(Static):
                     allow_blank=False,
                     id="statusSelect",
                 )
+                yield Label("", id="staleLabel")
 
         with Vertical():
-            yield Input(id="filterInput")
+            yield Input(
+                placeholder="Filter runs, prefix with ~ for a fuzzy match",
+                id="filterInput",
+            )
             yield DataTable(id="runDataTable")
 
     def on_mount(self) -> None:
         table = self.query_one(DataTable)
         table.cursor_type = "row"
         table.zebra_stripes = True
-        run_list = (
-            "namespace",
-            "supplychain",
-            "run",
-            "ready",
-            "created",
-            "progress",
-            "message",
-        )
-        table.add_columns(*run_list)
+        for column in self.columns:
+            table.add_column(column, key=column)
+        self.informer.start()
+        self.set_interval(self.sync_time_in_sec, self.sync_run_data)
         self.set_interval(self.refresh_time_in_sec, self.update_data)
         self.update_data()
         search_bar = self.query_one(Input)
@@ -94,7 +193,16 @@ class RunList(Static):
 
     # noinspection PyShadowingBuiltins
     def on_input_changed(self, input):
-        self.filter_string = input.value
+        # Debounce keystrokes so a fast typist only triggers one search
+        if self.filter_timer is not None:
+            self.filter_timer.stop()
+        self.filter_timer = self.set_timer(
+            self.filter_debounce_in_sec, partial(self.set_filter_string, input.value)
+        )
+
+    def set_filter_string(self, value):
+        self.filter_timer = None
+        self.filter_string = value
 
     # noinspection PyShadowingBuiltins
     def on_input_submitted(self, widget):
@@ -111,45 +219,246 @@ class RunList(Static):
     def on_data_table_row_selected(self, widget):
         data_table: DataTable = widget.data_table
         if data_table.id == "runDataTable":
-            run_name = (
-                str(data_table.get_row_at(widget.cursor_row)[1].plain)
-                + "run/"
-                + str(data_table.get_row_at(widget.cursor_row)[2].plain).split("/")[1]
+            run = self.run_summaries.get(widget.row_key.value)
+            if run is None:
+                return
+            # Imported on first use, it pulls in emoji, yaml and the log modules
+            from sup.screens.run_details import RunDetail
+
+            self.app.push_screen(
+                RunDetail(
+                    run=run.run,
+                    namespace=run.namespace,
+                    cache=self.run_cache,
+                    context=run.cluster,
+                )
+            )
+
+    def on_data_table_row_highlighted(self, widget):
+        data_table: DataTable = widget.data_table
+        if data_table.id != "runDataTable" or widget.row_key is None:
+            return
+        # Fetch the full runs under and around the cursor into the detail cache
+        first = max(0, widget.cursor_row - self.prefetch_rows)
+        last = min(data_table.row_count, widget.cursor_row + self.prefetch_rows + 1)
+        row_keys = [
+            data_table.coordinate_to_cell_key(Coordinate(row, 0)).row_key.value
+            for row in range(first, last)
+        ]
+        keys = [
+            (run.namespace, run.run, run.cluster)
+            for run in map(self.run_summaries.get, row_keys)
+            if run is not None
+        ]
+        self.refresh_scheduler.request(
+            "prefetch", partial(self.run_cache.prefetch, keys), lambda _: None
+        )
+
+    def on_unmount(self) -> None:
+        self.informer.stop()
+        self.save_snapshot()
+
+    def new_informer(self, label_selector: str = None, restore=False):
+        # Cluster-wide watches are not possible without cluster-wide list access,
+        # and they talk to the API server directly instead of the selected backend
+        return ClusterInformers(
+            RunInformer(
+                context=context,
+                label_selector=label_selector,
+                restore=self.restore_snapshot if restore else None,
+                transform=partial(RunSummary.from_run, cluster=context),
             )
-            ns = str(data_table.get_row_at(widget.cursor_row)[0].plain)
-            # self.notify(run_name)
-            self.app.push_screen(RunDetail(run=run_name, namespace=ns))
-
-    # noinspection PyBroadException
-    def _update_data_handler(self):
-        try:
-            self.run_data = KubectlCmd.get_run_list(
-                chain=self.selected_chain, status=self.selected_status
+            for context in self.contexts
+            if not self.polling_only
+        )
+
+    def restore_snapshot(self, informer: RunInformer):
+        # Runs in the informer's start thread, before its watches start
+        context = informer.context or Cluster.current_context()
+        self.snapshot_contexts[informer.context] = context
+        snapshot = self.snapshot.load(context)
+        if snapshot is None:
+            return
+        informer.restore(snapshot["resources"])
+        self.app.call_from_thread(self._show_snapshot, snapshot)
+
+    def _show_snapshot(self, snapshot):
+        if not self.supply_chains:
+            self.supply_chains = snapshot["supply_chains"]
+        self.stale = not self.informer.synced
+        if self.stale:
+            saved = time.strftime("%H:%M", time.localtime(snapshot["saved"]))
+            self.query_one("#staleLabel").update(
+                Text(f"Cached runs from {saved}, syncing...", style="italic #fc9847")
             )
-            self.supply_chains = KubectlCmd.get_sc_list()
-            # self.notify(
-            #     f"Run Data updated at {datetime.now()}",
-            #     timeout=self.refresh_time_in_sec,
-            # )
-        except Exception as err:
+        self.sync_run_data()
+
+    def clear_stale(self):
+        if self.stale:
+            self.stale = False
+            self.query_one("#staleLabel").update("")
+
+    def save_snapshot(self):
+        # Only a complete, unfiltered view of a context is worth restoring
+        if self.informer.label_selector is not None:
+            return
+        for member in self.informer.members.values():
+            context = self.snapshot_contexts.get(member.context)
+            if context is None or member.error is not None or not member.synced:
+                continue
+            try:
+                self.snapshot.save(context, member.snapshot(), self.supply_chains)
+            except OSError:
+                pass
+
+    def sync_run_data(self):
+        if self.informer.synced:
+            self.clear_stale()
+        self.report_cluster_errors()
+        if self.informer.errors().keys() - self.polled_contexts:
+            # A cluster whose informer just failed is polled right away
+            self.update_data()
+        if self.informer.generation == self.synced_generation:
+            return
+        self.synced_generation = self.informer.generation
+        self.apply_filters()
+
+    def apply_filters(self):
+        runs = self.informer.items()
+        for polled in self.polled_runs.values():
+            runs.extend(polled)
+        self.run_data = KubectlCmd.filter_run_list(
+            runs,
+            chain=self.selected_chain,
+            status=self.selected_status,
+        )
+
+    def _refresh_error_handler(self, err):
+        self.notify(
+            f"Sup was unable to get Run data from the cluster. Make sure the cluster is accessible and the kubeconfig is valid. {err}",
+            title="Refresh Error",
+            severity="error",
+            timeout=self.refresh_time_in_sec,
+        )
+
+    def report_cluster_errors(self):
+        # Every cluster is reported once when it starts failing, not on every retry
+        errors = {
+            context: member.last_error
+            for context, member in self.informer.members.items()
+            if member.error is None and member.last_error is not None
+        }
+        errors.update(self.poll_errors)
+        for context, err in errors.items():
+            if context in self.cluster_errors:
+                continue
+            cluster = "the cluster" if context is None else f"cluster {context}"
             self.notify(
-                f"Sup was unable to get Run data from the cluster. Make sure the cluster is accessible and the kubeconfig is valid. {err}",
+                f"Sup was unable to get Run data from {cluster}. Make sure the cluster is accessible and the kubeconfig is valid. {err}",
                 title="Refresh Error",
                 severity="error",
                 timeout=self.refresh_time_in_sec,
             )
+        self.cluster_errors = errors
+
+    def poll_runs(self, contexts, chain):
+        # Only the chain's runs are polled, the status is filtered locally like for
+        # informer runs
+        return KubectlCmd.per_context(
+            partial(self.poll_context_runs, chain=chain),
+            contexts,
+            self.cluster_timeout_in_sec,
+        )
+
+    def poll_context_runs(self, context, chain=None):
+        if not self.namespaced:
+            return Cluster.get_run_list(chain=chain, latest=False, context=context)
+        return Cluster.get_run_list(
+            chain=chain,
+            latest=False,
+            context=context,
+            namespaces=self.namespaces or Cluster.namespaces(context),
+            on_namespace=partial(
+                self.app.call_from_thread, self._merge_namespace_runs, context
+            ),
+        )
+
+    def _merge_namespace_runs(self, context, namespace, runs):
+        # Shown as soon as the namespace returns instead of after the slowest one
+        merged = [
+            run
+            for run in self.polled_runs.get(context, [])
+            if run.namespace != namespace
+        ]
+        merged.extend(runs)
+        self.polled_runs[context] = merged
+        self.apply_filters()
+
+    def poll_supply_chains(self):
+        results, errors = KubectlCmd.per_context(
+            Cluster.get_sc_list, self.contexts, self.cluster_timeout_in_sec
+        )
+        if not results:
+            raise next(iter(errors.values()))
+        supply_chains = dict()
+        for context in self.contexts:
+            for sc in results.get(context, []):
+                supply_chains.setdefault(sc.get("metadata").get("name"), sc)
+        return list(supply_chains.values())
+
+    def _set_polled_runs(self, polled):
+        results, errors = polled
+        if results:
+            self.clear_stale()
+        # A cluster that timed out keeps the namespaces it managed to return
+        polled_runs = {
+            context: runs
+            for context, runs in self.polled_runs.items()
+            if isinstance(errors.get(context), TimeoutError)
+        }
+        polled_runs.update(results)
+        self.polled_runs = polled_runs
+        self.poll_errors = errors
+        self.report_cluster_errors()
+        self.apply_filters()
+
+    def _set_supply_chains(self, supply_chains):
+        self.supply_chains = supply_chains
 
     def update_data(self):
-        t = Thread(target=self._update_data_handler)
-        t.start()
+        # Runs come from the informers, only poll the clusters whose informer could not start
+        failed = list(self.contexts if self.polling_only else self.informer.errors())
+        self.polled_contexts = set(failed)
+        self.polled_selector = KubectlCmd.chain_selector(self.selected_chain)
+        if failed:
+            self.refresh_scheduler.request(
+                "runs",
+                partial(self.poll_runs, failed, self.selected_chain),
+                self._set_polled_runs,
+                self._refresh_error_handler,
+            )
+        self.refresh_scheduler.request(
+            "supply_chains",
+            self.poll_supply_chains,
+            self._set_supply_chains,
+            self._refresh_error_handler,
+        )
 
     def watch_selected_chain(self):
-        if time.time() - self.start > 5:
+        selector = KubectlCmd.chain_selector(self.selected_chain)
+        if selector != self.informer.label_selector:
+            # Only the selected chain's runs are listed and watched
+            self.informer.stop()
+            self.informer = self.new_informer(label_selector=selector)
+            self.synced_generation = -1
+            self.informer.start()
+        if self.polled_contexts and selector != self.polled_selector:
+            # Polled clusters are listed again with the new chain's selector
             self.update_data()
+        self.apply_filters()
 
     def watch_selected_status(self):
-        if time.time() - self.start > 5:
-            self.update_data()
+        self.apply_filters()
 
     # noinspection PyTypeChecker
     def watch_supply_chains(self):
@@ -157,157 +466,120 @@ class RunList(Static):
         val = [("all", "all")]
         for sc in self.supply_chains:
             sc_name = sc.get("metadata").get("name")
-            val.append((sc_name, sc_name))
+            # Runs are labelled with the workload kind the chain defines
+            sc_kind = sc.get("spec", {}).get("defines", {}).get("kind", sc_name)
+            val.append((sc_name, sc_kind))
+        if val == self.chain_options:
+            return
+        self.chain_options = val
         select.set_options(val)
+        if self.selected_chain in [v for _, v in val]:
+            select.value = self.selected_chain
 
     def watch_filter_string(self):
-        self.watch_run_data()
+        self.render_rows()
 
+    @Tracer.traced("watch_run_data")
     def watch_run_data(self):
-        table = self.query_one(DataTable)
-        current_pos = table.cursor_row
-        y_pos = table.scroll_y
-        table.clear()
+        run_rows = dict()
+        run_summaries = dict()
+        multi = CLUSTER_COLUMN in self.columns
         for run in self.run_data:
-            if self.filter_string and self.filter_string not in (
-                str(
-                    run.get("metadata")
-                    .get("labels")
-                    .get("supply-chain.apps.tanzu.vmware.com/workload-name")
-                )
-                + "/"
-                + str(run.get("metadata").get("name"))
+            run_summaries[run.key] = run
+            row = self.run_rows.get(run.key)
+            # Rows are memoized by resourceVersion, unchanged runs are not formatted again
+            if (
+                row is None
+                or run.resource_version is None
+                or row[0] != run.resource_version
             ):
-                continue
-
-            styled_row = list()
-
-            # Namespace
-            styled_row.append(
-                Text(
-                    str(run.get("metadata").get("namespace")),
-                    style="#96999e",
-                )
-            )
-
-            # Supply chain
-            styled_row.append(
-                Text(
-                    str(
-                        run.get("metadata")
-                        .get("labels")
-                        .get("supply-chain.apps.tanzu.vmware.com/workload-kind")
-                    ),
-                    style="italic #ffffff",
-                )
-            )
-
-            # Name
-            styled_row.append(
-                Text(
-                    str(
-                        run.get("metadata")
-                        .get("labels")
-                        .get("supply-chain.apps.tanzu.vmware.com/workload-name")
-                    ),
-                    style="#dbce0d",
-                )
-                + "/"
-                + Text(
-                    str(run.get("metadata").get("name")),
-                    style="italic #ffffff",
-                ),
-            )
-
-            # Status
-            ready = str(run.get("status").get("conditions")[1].get("reason"))
-            if ready == "Succeeded":
-                styled_row.append(
-                    Text(
-                        ready,
-                        style="italic #03AC13",
-                        justify="right",
-                    )
-                )
-            elif ready == "Failed":
-                styled_row.append(
-                    Text(
-                        ready,
-                        style="italic #d1573f",
-                        justify="right",
-                    )
-                )
-            elif ready == "PlatformFailed":
-                styled_row.append(
-                    Text(
-                        ready,
-                        style="italic #fc9847",
-                        justify="right",
-                    )
-                )
-            else:
-                styled_row.append(
-                    Text(
-                        ready,
-                        style="italic #3f9bd1",
-                        justify="right",
-                    )
-                )
-
-            # Timestamp
-            styled_row.append(
-                Text(
-                    str(run.get("metadata").get("creationTimestamp")),
-                    style="#ffffff",
-                )
-            )
+                values = run.values()
+                if multi:
+                    values = (run.cluster,) + values
+                cells = tuple(RunCell(c, v) for c, v in zip(self.columns, values))
+                row = (run.resource_version, values, cells)
+            run_rows[run.key] = row
+        self.run_rows = run_rows
+        self.run_summaries = run_summaries
+        run_column = self.columns.index("run")
+        self.search_index = RunSearchIndex(
+            {key: row[1][run_column] for key, row in self.run_rows.items()}
+        )
+        self.render_rows()
+
+    @Tracer.traced("render_rows")
+    def render_rows(self):
+        query = self.filter_string
+        fuzzy = query.startswith("~")
+        keys = self.search_index.search(query.lstrip("~"), fuzzy=fuzzy)
+        # A keystroke that does not change the matches leaves the table alone
+        if self.rendered_from is self.run_rows and keys == self.rendered_keys:
+            return
+        self.rendered_from = self.run_rows
+        self.rendered_keys = keys
 
-            # Progress
-            progress_line = Text(str(""))
-
-            for stage in run.get("status").get("workloadRun").get("spec").get("stages"):
-                for resumption in stage.get("resumptions", []):
-                    if (
-                        resumption.get("passed", None)
-                        and resumption.get("passed", None) is True
-                    ):
-                        progress_line += Text("✓", style="bold #22c91c")
-                    elif (
-                        resumption.get("passed", None)
-                        and resumption.get("passed", None) is False
-                    ):
-                        progress_line += Text("X", style="bold #c91c28")
-                    else:
-                        progress_line += Text("-", style="bold #ffffff")
-                pipeline = stage.get("pipeline", {})
-                if (
-                    pipeline.get("passed", None) is not None
-                    and pipeline.get("passed", None) is True
-                ):
-                    progress_line += Text("✓", style="bold #22c91c")
-                elif (
-                    pipeline.get("passed", None) is not None
-                    and pipeline.get("passed", None) is False
+        table = self.query_one(DataTable)
+        cursor_key = None
+        if table.row_count:
+            cursor_key = table.coordinate_to_cell_key(
+                table.cursor_coordinate
+            ).row_key.value
+        y_pos = table.scroll_y
+        rows = {key: self.run_rows[key] for key in keys}
+
+        removed = self.rendered_rows.keys() - rows.keys()
+        kept = [key for key in self.rendered_rows if key in rows]
+        added = [key for key in rows if key not in self.rendered_rows]
+        # remove_row reindexes every row of the table, removing many rows costs more
+        # than adding the remaining ones again. New rows can only be added at the
+        # bottom, the table is rebuilt when that would not keep run_data order.
+        removal_cost = len(removed) * len(self.rendered_rows)
+        if kept + added != list(rows) or removal_cost > self.rebuild_ratio * len(rows):
+            table.clear()
+            self.rendered_rows = dict()
+        else:
+            for key in removed:
+                table.remove_row(key)
+                del self.rendered_rows[key]
+        pending = list()
+        for key, (_, values, cells) in rows.items():
+            previous = self.rendered_rows.get(key)
+            if previous is None:
+                pending.append((key, values, cells))
+            elif previous != values:
+                for column, old, new, cell in zip(
+                    self.columns, previous, values, cells
                 ):
-                    progress_line += Text("X", style="bold #c91c28")
-                else:
-                    progress_line += Text("-", style="bold #ffffff")
-
-            styled_row.append(progress_line)
-
-            # Message
-            styled_row.append(
-                Text(
-                    str(
-                        run.get("status")
-                        .get("conditions")[1]
-                        .get("message")
-                        .split(".")[0]
-                    ),
-                    style="#ffffff",
-                )
-            )
-
-            table.add_row(*styled_row)
-            table.move_cursor(row=current_pos)
-            table.scroll_target_y = y_pos
+                    if old != new:
+                        table.update_cell(key, column, cell)
+                self.rendered_rows[key] = values
+
+        self.render_generation += 1
+        self.pending_rows = pending[::-1]
+        self.pending_cursor = (cursor_key, y_pos)
+        self.add_pending_rows(self.render_generation)
+
+    def add_pending_rows(self, generation):
+        """Add the next `rows_per_frame` rows of a render, the rest after a refresh.
+
+        Adding a row costs about 30us, thousands of rows added at once would hold
+        up the keystroke or update that brought them for a visible time.
+        """
+        # The table is removed before the run list when the app exits
+        tables = self.query(DataTable)
+        if generation != self.render_generation or not tables:
+            return
+        table = tables.first()
+        for _ in range(min(self.rows_per_frame, len(self.pending_rows))):
+            key, values, cells = self.pending_rows.pop()
+            table.add_row(*cells, key=key)
+            self.rendered_rows[key] = values
+        if self.pending_cursor is not None:
+            cursor_key, y_pos = self.pending_cursor
+            if cursor_key in self.rendered_rows:
+                table.move_cursor(row=table.get_row_index(cursor_key))
+            if cursor_key in self.rendered_rows or not self.pending_rows:
+                table.scroll_target_y = y_pos
+                self.pending_cursor = None
+        if self.pending_rows:
+            self.call_after_refresh(self.add_pending_rows, generation)